@@ -18,63 +18,8 @@ from settings import (
 from particles import SparksContainer
 from button import Button
 
-num_pass, num_fail = pygame.init()
-
-if num_fail > 0:
-    print("There is some Error with pygame!")
-    sys.exit()
-
 width, height = 1200, BOARD_SIZE + BOARD_OFFSET * 2
-pygame.display.set_caption("Checker AI")
-screen = pygame.display.set_mode((width, height))
-
 BG_COLOR = pygame.Color("#F4E7C6")
-background = pygame.Surface((width, height))
-background.fill(BG_COLOR)
-
-pygame.draw.rect(
-    background,
-    pygame.Color("#DCCFAE"),
-    (
-        BOARD_OFFSET - BOARD_BORDER_THICKNESS,
-        BOARD_OFFSET - BOARD_BORDER_THICKNESS,
-        BOARD_SIZE + BOARD_BORDER_THICKNESS * 2,
-        BOARD_SIZE + BOARD_BORDER_THICKNESS * 2,
-    ),
-    border_radius=10,
-)
-
-for file in range(8):
-    for rank in range(8):
-        is_light = (file + rank) % 2 == 0
-        color = pygame.Color("#FFFFFF") if is_light else pygame.Color("#183037")
-        pygame.draw.rect(
-            background,
-            color,
-            (
-                file * CELL_SIZE + BOARD_OFFSET,
-                rank * CELL_SIZE + BOARD_OFFSET,
-                CELL_SIZE,
-                CELL_SIZE,
-            ),
-        )
-
-info_box_rect = pygame.Rect(
-    BOARD_OFFSET + BOARD_BORDER_THICKNESS + BOARD_SIZE + 10,
-    10,
-    490,
-    BOARD_SIZE + BOARD_BORDER_THICKNESS * 2,
-)
-
-pygame.draw.rect(
-    background,
-    pygame.Color("#FEF1D0"),
-    info_box_rect,
-    border_radius=10,
-)
-
-info_box = pygame.image.load("./assets/images/info_section.png")
-background.blit(info_box, info_box_rect.topleft)
 
 
 def load_and_scale(filename: str, scale_factor: float, alpha: int = 255):
@@ -97,29 +42,8 @@ def load_and_scale(filename: str, scale_factor: float, alpha: int = 255):
 
 
 PIECES_SCALE_FACTOR = 0.4
-RED_PIECE = load_and_scale("./assets/images/red.png", PIECES_SCALE_FACTOR)
-BLUE_PIECE = load_and_scale("./assets/images/blue.png", PIECES_SCALE_FACTOR)
-
-RED_INFO_PIECE = load_and_scale("./assets/images/red.png", 0.76)
-BLUE_INFO_PIECE = load_and_scale("./assets/images/blue.png", 0.76)
-DRAW_INFO_PIECE = load_and_scale("./assets/images/grey.png", 0.76)
-
-RED_WIN_BANNER = load_and_scale("./assets/images/Red Banner.png", 1)
-BLUE_WIN_BANNER = load_and_scale("./assets/images/Blue Banner.png", 1)
-DRAW_BANNER = load_and_scale("./assets/images/Draw Banner.png", 1)
-
-MOVE_SQUARE = pygame.Surface((CELL_SIZE, CELL_SIZE))
-MOVE_SQUARE.fill((255, 255, 255))
-MOVE_SQUARE.set_alpha(50)
-
-BLACK_OVERLAY = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
-BLACK_OVERLAY.set_alpha(100)
-
 MAX_NUMBER_OF_FIREWORKS = 65
 
-BTN_FONT = pygame.font.Font("./assets/fonts/FiraCode-Medium.ttf", 24)
-TEXT_FONT = pygame.font.Font("./assets/fonts/FiraCode-Medium.ttf", 24)
-
 
 def get_piece_image(piece_value: int | None, is_info: bool = False):
     """Gets the Image for a piece
@@ -200,8 +124,11 @@ async def main():
         screen.fill(BG_COLOR)
         screen.blit(background, (0, 0))
 
+        game.poll_comp_play()
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                game.close()
                 pygame.quit()
                 sys.exit()
 
@@ -467,9 +394,9 @@ async def main():
             else round(game.ai_time, TIME_ROUND_OFF)
         )
 
-        depth_surf = TEXT_FONT.render(str(game.depth_searched), False, (0, 0, 0))
+        depth_surf = TEXT_FONT.render(str(game.stats.depth), False, (0, 0, 0))
         positions_surf = TEXT_FONT.render(
-            str(game.positions_evaluated) if not game.comp_is_playing else "...",
+            str(game.stats.total_nodes) if not game.comp_is_playing else "...",
             False,
             (0, 0, 0),
         )
@@ -483,5 +410,86 @@ async def main():
         await asyncio.sleep(0)
         clock.tick(60)
 
-print("start game")
-asyncio.run(main())
+
+if __name__ == "__main__":
+    # pygame is only set up when the game is run, the engine worker
+    # imports this module again (with spawn) & must not open a window
+    num_pass, num_fail = pygame.init()
+
+    if num_fail > 0:
+        print("There is some Error with pygame!")
+        sys.exit()
+
+    pygame.display.set_caption("Checker AI")
+    screen = pygame.display.set_mode((width, height))
+
+    background = pygame.Surface((width, height))
+    background.fill(BG_COLOR)
+
+    pygame.draw.rect(
+        background,
+        pygame.Color("#DCCFAE"),
+        (
+            BOARD_OFFSET - BOARD_BORDER_THICKNESS,
+            BOARD_OFFSET - BOARD_BORDER_THICKNESS,
+            BOARD_SIZE + BOARD_BORDER_THICKNESS * 2,
+            BOARD_SIZE + BOARD_BORDER_THICKNESS * 2,
+        ),
+        border_radius=10,
+    )
+
+    for file in range(8):
+        for rank in range(8):
+            is_light = (file + rank) % 2 == 0
+            color = pygame.Color("#FFFFFF") if is_light else pygame.Color("#183037")
+            pygame.draw.rect(
+                background,
+                color,
+                (
+                    file * CELL_SIZE + BOARD_OFFSET,
+                    rank * CELL_SIZE + BOARD_OFFSET,
+                    CELL_SIZE,
+                    CELL_SIZE,
+                ),
+            )
+
+    info_box_rect = pygame.Rect(
+        BOARD_OFFSET + BOARD_BORDER_THICKNESS + BOARD_SIZE + 10,
+        10,
+        490,
+        BOARD_SIZE + BOARD_BORDER_THICKNESS * 2,
+    )
+
+    pygame.draw.rect(
+        background,
+        pygame.Color("#FEF1D0"),
+        info_box_rect,
+        border_radius=10,
+    )
+
+    info_box = pygame.image.load("./assets/images/info_section.png")
+    background.blit(info_box, info_box_rect.topleft)
+
+    RED_PIECE = load_and_scale("./assets/images/red.png", PIECES_SCALE_FACTOR)
+    BLUE_PIECE = load_and_scale("./assets/images/blue.png", PIECES_SCALE_FACTOR)
+
+    RED_INFO_PIECE = load_and_scale("./assets/images/red.png", 0.76)
+    BLUE_INFO_PIECE = load_and_scale("./assets/images/blue.png", 0.76)
+    DRAW_INFO_PIECE = load_and_scale("./assets/images/grey.png", 0.76)
+
+    RED_WIN_BANNER = load_and_scale("./assets/images/Red Banner.png", 1)
+    BLUE_WIN_BANNER = load_and_scale("./assets/images/Blue Banner.png", 1)
+    DRAW_BANNER = load_and_scale("./assets/images/Draw Banner.png", 1)
+
+    MOVE_SQUARE = pygame.Surface((CELL_SIZE, CELL_SIZE))
+    MOVE_SQUARE.fill((255, 255, 255))
+    MOVE_SQUARE.set_alpha(50)
+
+    BLACK_OVERLAY = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
+    BLACK_OVERLAY.set_alpha(100)
+
+    BTN_FONT = pygame.font.Font("./assets/fonts/FiraCode-Medium.ttf", 24)
+    TEXT_FONT = pygame.font.Font("./assets/fonts/FiraCode-Medium.ttf", 24)
+
+    print("start game")
+    asyncio.run(main())
@@ -1,262 +1,952 @@
 """Contains all the methods and functions
 & variables to make the ai play its moves
-"""
 
-# pylint: disable=global-statement, global-variable-not-assigned
+The settings of the search are the constants of this module, everything
+a search changes (the transposition table, the move ordering tables, the
+statistics & the limits) belongs to a SearchEngine (only the locked move
+cache of move.py is shared) so many games can search in one process, each
+with its own engine or taking turns with engines from a pool.
+search_best_move uses DEFAULT_ENGINE.
+"""
 
 import time
 from math import inf
-from copy import deepcopy
 
-from .move import Move, generate_moves
-from .board import Board
+from .move import (
+    CAPTURES_SHIFT,
+    KING_FLAG,
+    Move,
+    can_move,
+    capture_moves,
+    legal_moves,
+    play_move,
+)
+from .board import MOVES_WITHOUT_KILLS_DRAW, Board
+from .book import OpeningBook
+from .evaluation import child_positions, evaluate_batch
+from .stats import SearchStats
+from .tablebase import DRAW, Tablebase
+from .time_manager import BEST_MOVE_CHANGE_RATIO
+from .transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# the transposition table of an engine is kept between iterations
+# & between moves
+TRANSPOSITION_TABLE_SIZE_MB = 32
 
-POSITIONS = 0
-TRANSPOSITION_TABLE = {}
-ITERATIVE_DEEPENING_TABLE = {}
 WIN_CUT_OFF = 10000000
-SHOULD_CUT_OFF = False
 
-
-def search_all_captures(board: Board, alpha, beta, start_time, time_limit):
-    """Search all captures until no more captures are
-    possible. this allows more accurate score checking
+# the clock is only read every TIME_CHECK_INTERVAL nodes (search &
+# quiescence nodes together) instead of at every node
+TIME_CHECK_INTERVAL = 1024
+
+# positions with up to TABLEBASE.max_pieces pieces get their exact
+# score from the endgame tablebases (see tablebase.py) without being
+# searched, the faster the win the higher the score
+TABLEBASE = Tablebase()
+TABLEBASE_WIN = WIN_CUT_OFF * 2
+
+# the moves of the positions in the opening book (see book.py)
+# are played without searching
+OPENING_BOOK = OpeningBook()
+
+# the root search starts with a window of +- ASPIRATION_WINDOW around
+# the last score and widens it when the score falls outside of it
+ASPIRATION_WINDOW = 8
+MAX_ASPIRATION_WINDOW = 512
+
+# the search stops early when the best move stayed the same for
+# EASY_MOVE_STABILITY iterations & no other move gets within
+# EASY_MOVE_MARGIN of it, or when the next iteration cannot finish
+EASY_MOVE_MARGIN = 20
+EASY_MOVE_MIN_DEPTH = 4
+EASY_MOVE_STABILITY = 3
+NEXT_ITERATION_TIME_RATIO = 0.5
+
+# the quiescence search scores quiet positions without the mobility
+# (which needs move generation) & stops following captures after
+# QUIESCENCE_MAX_DEPTH of them
+STAND_PAT_MOBILITY = False
+QUIESCENCE_MAX_DEPTH = 8
+
+# the stand pats of the children of depth 1 & quiescence nodes can be
+# worked out together with the batched evaluation (see evaluation.py).
+# numpy only pays for itself on big batches so it is off by default,
+# the few children of a node are faster to score one at a time
+BATCH_LEAF_EVALUATION = False
+
+# move ordering: the hash move, captures & killer moves (two per ply)
+# come before the quiet moves which are ordered by their history
+HASH_MOVE_SCORE = 1 << 40
+CAPTURE_SCORE = 1 << 35
+KILLER_SCORE = 1 << 30
+
+# principal variation search: every move after the first is searched
+# with a null window & only searched again with the full window if
+# it turns out to be better
+USE_PRINCIPAL_VARIATION_SEARCH = True
+NULL_WINDOW = 0.001
+
+# late move reductions: quiet moves late in the order (not captures,
+# promotions or killers) are searched one ply shallower (two plies from
+# LMR_DEEP_MOVE_INDEX on) & searched again at full depth if they beat alpha
+USE_LATE_MOVE_REDUCTIONS = True
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVE_INDEX = 3
+LMR_DEEP_MOVE_INDEX = 6
+
+# the deepest ply of the search, the start & end square
+# of a move (12 bits) index the history table
+MAX_PLY = 128
+HISTORY_SIZE = 4096
+
+
+def leaf_evaluations(board: Board, all_moves) -> list[float] | None:
+    """Scores the positions after all the moves in one batch,
+    when BATCH_LEAF_EVALUATION is on
 
     Args:
         board (Board): the board
-        alpha (_type_): the highest value
-        beta (_type_): the worst values
-        start_time (_type_): the start_time
-        time_limit (_type_): the time limit for the search
+        all_moves (Iterable[int]): the move codes
 
     Returns:
-        _type_: the score
+        list[float] | None: the static evaluation after every move
+            for the side to play then or None when it is off
     """
-    global POSITIONS, SHOULD_CUT_OFF
-    evaluation = board.score
-
-    if time.monotonic() - start_time > time_limit:
-        SHOULD_CUT_OFF = True
-        return 0
-
-    if evaluation >= beta:
-        POSITIONS += 1
-        return beta
-
-    alpha = max(alpha, evaluation)
-    all_moves = generate_moves(board)
-
-    try:
-        if not all_moves[0].is_killing_move:
-            POSITIONS += 1
-            return alpha
-    except IndexError:
-        return evaluation
-
-    for move in all_moves:
-        move.play(board)
-        evaluation = -search_all_captures(board, -beta, -alpha, start_time, time_limit)
-        board.undo_move()
-
-        if evaluation >= beta:
-            POSITIONS += 1
-            return beta
+    if not BATCH_LEAF_EVALUATION or not all_moves:
+        return None
 
-        alpha = max(alpha, evaluation)
+    positions, blue_to_play = child_positions(board, all_moves)
+    return evaluate_batch(positions, blue_to_play, STAND_PAT_MOBILITY).tolist()
 
-    return alpha
 
+def tablebase_score(result: int, distance: int) -> float:
+    """Turns a result from the tablebase into a score
 
-def search(board: Board, depth: int, alpha, beta, start_time, time_limit) -> float:
-    global POSITIONS, TRANSPOSITION_TABLE, SHOULD_CUT_OFF, ITERATIVE_DEEPENING_TABLE
-    board.update_state()
+    Args:
+        result (int): WIN, LOSS or DRAW for the side to play
+        distance (int): the plies until the game is over
 
-    if time.monotonic() - start_time > time_limit:
-        SHOULD_CUT_OFF = True
+    Returns:
+        float: the score
+    """
+    if result == DRAW:
         return 0
 
-    key = board.hash()
+    return result * (TABLEBASE_WIN - distance)
 
-    if key in TRANSPOSITION_TABLE[depth]:
-        return TRANSPOSITION_TABLE[depth][key]
 
-    if depth == 0:
-        POSITIONS += 1
-        score = search_all_captures(board, alpha, beta, start_time, time_limit)
-        TRANSPOSITION_TABLE[depth][key] = score
-        return score
+def probe_tablebase(board: Board) -> tuple[int, int] | None:
+    """Looks the position up in the tablebase. The tables know nothing
+    about the draw after MOVES_WITHOUT_KILLS_DRAW moves without a kill,
+    so a win or loss that may not come before it is left to the search
 
-    if not board.is_playing:
-        POSITIONS += 1
-        score = board.score
-        TRANSPOSITION_TABLE[depth][key] = score
-        return score
-
-    try:
-        # check if depth present
-        ITERATIVE_DEEPENING_TABLE[depth]
-    except KeyError:
-        # the depth is not there sc create it
-        ITERATIVE_DEEPENING_TABLE[depth] = []
-    finally:
-        # FIXME
-        all_moves = []
-
-        # if len(ITERATIVE_DEEPENING_TABLE[depth]) > 0:
-        #     all_moves = ITERATIVE_DEEPENING_TABLE[depth]
-
-        # else:
-        all_moves = generate_moves(board)
+    Args:
+        board (Board): the board
 
-        def score_move(move: Move):
-            move_score = 0
+    Returns:
+        tuple[int, int] | None: WIN, LOSS or DRAW & the distance in plies
+            or None if the position has to be searched
+    """
+    result = TABLEBASE.probe(board)
+    if result is None:
+        return None
 
-            weak_piece = abs(board.piece(move.start)) == 1
-            on_kill_king = 4 if weak_piece else 2
+    outcome, distance = result
+    if (
+        outcome != DRAW
+        and board.moves_without_kills + distance >= MOVES_WITHOUT_KILLS_DRAW
+    ):
+        return None
 
-            for index in move.kills:
-                if abs(board.piece(index)) == 2:
-                    move_score += on_kill_king
-                    continue
+    return result
 
-                move_score += 2
 
-            if move.make_king:
-                move_score += 3
+def best_tablebase_move(board: Board, all_moves: list[int]) -> int | None:
+    """Picks the best move straight from the tablebase: the fastest
+    win, the slowest loss or the draw the evaluation likes best
 
-            return move_score
+    Args:
+        board (Board): the board
+        all_moves (list[int]): the legal moves
 
-        all_moves.sort(key=score_move)
+    Returns:
+        int | None: the best move or None if the position is not in the tables
+    """
+    if (board.blue | board.red).bit_count() > TABLEBASE.max_pieces:
+        return None
 
-    moves_score = []
+    best_move, best_score = None, None
 
-    best_val = -inf
     for move in all_moves:
-        move.play(board)
-        evaluation = -search(board, depth - 1, -beta, -alpha, start_time, time_limit)
-
-        # add the evaluation score
-        moves_score.append(evaluation)
+        play_move(board, move)
+        result = probe_tablebase(board)
+        score = None
 
+        if result is not None:
+            score = (-tablebase_score(*result), -board.evaluate())
         board.undo_move()
 
-        if evaluation >= beta:
-            POSITIONS += 1
-            TRANSPOSITION_TABLE[depth][key] = beta
-            return beta
-
-        alpha = max(best_val, evaluation)
+        if score is None:
+            return None
 
-    arranged_moves = list(
-        map(lambda x: x[0], sorted(zip(all_moves, moves_score), key=lambda x: x[1]))
-    )
-    ITERATIVE_DEEPENING_TABLE[depth] = arranged_moves
+        if best_score is None or score > best_score:
+            best_move, best_score = move, score
 
-    return alpha
+    return best_move
 
 
-#  DONE -TODO: CREATE ITERATIVE DEEPENING FUNC (board, time limit)
-def iterative_deepening(board: Board, time_limit: float) -> tuple[float, float]:
-    """This is the Function that using iterative_deepening
-    searches as far as possible into each and every move based
-    on the given time limit
+def bound_type(score: float, alpha: float, beta: float) -> int:
+    """Gets the kind of bound a fail hard score is
+    for the window it was searched with
 
     Args:
-        board (Board): the board
-        time_limit (float): the time limit for the search
+        score (float): the score
+        alpha (float): the lower end of the window
+        beta (float): the upper end of the window
 
     Returns:
-        tuple[float, float]: score, depth searched
+        int: EXACT, LOWER_BOUND or UPPER_BOUND
+    """
+    if score <= alpha:
+        return UPPER_BOUND
+    if score >= beta:
+        return LOWER_BOUND
+    return EXACT
+
+
+class SearchEngine:
+    """Everything one search needs: the transposition table, the
+    killer moves & history of the move ordering, the statistics
+    of the last search & the limits that cut it off.
+
+    Engines only share the move cache of move.py, which has a lock,
+    & TABLEBASE & OPENING_BOOK, which are read from memory maps &
+    only count their hits, so any number of them can search in one
+    process, in threads too. An engine searches one position at a time
     """
-    global SHOULD_CUT_OFF, TRANSPOSITION_TABLE, ITERATIVE_DEEPENING_TABLE
-
-    start_time = time.monotonic()
-    SHOULD_CUT_OFF = False
-    depth = 1
-    score = 0
-
-    # should reset for every search
-    ITERATIVE_DEEPENING_TABLE = {}
-
-    while not SHOULD_CUT_OFF:
-        # cut of if time passed
-        if time.monotonic() - start_time > time_limit:
-            SHOULD_CUT_OFF = True
-            continue
-
-        # resting transpositionTable for every depth
-        TRANSPOSITION_TABLE = {key: {} for key in range(depth + 1)}
-        search_score = -search(board, depth, -inf, inf, start_time, time_limit)
-
-        # cut of if found winning move
-        if search_score >= 50000000:
-            return search_score, depth
-
-        if not SHOULD_CUT_OFF:
-            score = search_score
 
-        # update the depth for the next search
-        depth += 1
+    def __init__(
+        self,
+        size_mb: float = TRANSPOSITION_TABLE_SIZE_MB,
+        transposition_table=None,
+    ):
+        """Makes an engine with empty tables
+
+        Args:
+            size_mb (float, optional): the size of its transposition table.
+                Defaults to TRANSPOSITION_TABLE_SIZE_MB.
+            transposition_table (TranspositionTable | SharedTranspositionTable
+                | None, optional): a table to use instead of a new one
+                (see parallel.py). Defaults to None.
+        """
+        if transposition_table is None:
+            transposition_table = TranspositionTable(size_mb)
+        self.transposition_table = transposition_table
+
+        # every ply of the search fills its own list of move codes
+        # so no new lists are made while searching
+        self.move_buffers: list[list[int]] = [[] for _ in range(MAX_PLY)]
+        self.killer_moves: list[list[int]] = [[0, 0] for _ in range(MAX_PLY)]
+        self.history: list[int] = [0] * HISTORY_SIZE
+
+        # the statistics of the last search (see stats.py), every
+        # iterative_deepening call starts new ones
+        self.stats = SearchStats()
+
+        self.should_cut_off = False
+        self.nodes_until_time_check = TIME_CHECK_INTERVAL
+
+        # the times (from time.monotonic) where the search is cut off &
+        # where no new iteration is started, on top of its own limits.
+        # The ponder search (see ponder.py) has no limits until the
+        # player moves
+        self.stop_time = inf
+        self.soft_stop_time = inf
+
+        # an Event (see engine_worker.py) that cuts the search off when
+        # it is set, it is looked at with the clock
+        self.cancel_token = None
+
+    def reset(self):
+        """Forgets everything learnt so the engine can be used for
+        a new game, the tables are emptied instead of made again.
+        The move cache of move.py is shared by all the engines so it
+        is left alone"""
+        self.transposition_table.clear()
+        self.history[:] = [0] * HISTORY_SIZE
+
+        for killers in self.killer_moves:
+            killers[0] = killers[1] = 0
+
+        self.stats = SearchStats()
+        self.should_cut_off = False
+        self.stop_time = self.soft_stop_time = inf
+
+    def stop(self):
+        """Cuts the search off at the next check of the clock, the
+        search resets the flag when it starts so the stop times are set
+        too, reset them with clear_stop after the search ended"""
+        self.should_cut_off = True
+        self.stop_time = self.soft_stop_time = -inf
+
+    def clear_stop(self):
+        """Takes the stop & the stop times away"""
+        self.should_cut_off = False
+        self.stop_time = self.soft_stop_time = inf
+
+    def search_all_captures(
+        self, board: Board, alpha, beta, start_time, time_limit, depth=0, stand_pat=None
+    ):
+        """Search all captures until no more captures are
+        possible. this allows more accurate score checking.
+
+        Only the captures are generated, a quiet position is scored
+        with the cheap static evaluation (stand pat) without looking
+        at its quiet moves & the captures are followed at most
+        QUIESCENCE_MAX_DEPTH moves deep
+
+        Args:
+            board (Board): the board
+            alpha (_type_): the highest value
+            beta (_type_): the worst values
+            start_time (_type_): the start_time
+            time_limit (_type_): the time limit for the search
+            depth (int, optional): the captures made so far. Defaults to 0.
+            stand_pat (float | None, optional): the static evaluation if it
+                is already known. Defaults to None.
+
+        Returns:
+            _type_: the score
+        """
+        self.stats.quiescence_nodes += 1
+
+        self.nodes_until_time_check -= 1
+        if self.nodes_until_time_check <= 0:
+            self.check_time(start_time, time_limit)
+
+        if self.should_cut_off:
+            return 0
+
+        all_moves = capture_moves(board)
+
+        # a side that cannot move has lost
+        if not all_moves and not can_move(board):
+            return -inf
+
+        if stand_pat is None:
+            stand_pat = board.evaluate(STAND_PAT_MOBILITY)
+        evaluation = stand_pat
 
-        # update iterative_deepening table
-        ITERATIVE_DEEPENING_TABLE = {
-            key + 1: value for (key, value) in ITERATIVE_DEEPENING_TABLE.items()
-        }
-        # print(ITERATIVE_DEEPENING_TABLE.keys())
+        if evaluation >= beta:
+            return beta
 
-    return score, depth - 1
+        alpha = max(alpha, evaluation)
 
+        if depth >= QUIESCENCE_MAX_DEPTH:
+            return alpha
 
-def search_best_move(real_board: Board, wait_time: int) -> tuple[Move, float, float]:
-    """This is the high level function that when given
-    a board and the time limit it can search
-    using iterative deepening it searches for it until
-    the given time limit is reached after which it returns
-    the best move.
+        stand_pats = leaf_evaluations(board, all_moves)
+
+        for index, move in enumerate(all_moves):
+            play_move(board, move)
+            evaluation = -self.search_all_captures(
+                board,
+                -beta,
+                -alpha,
+                start_time,
+                time_limit,
+                depth + 1,
+                stand_pats[index] if stand_pats is not None else None,
+            )
+            board.undo_move()
+
+            if evaluation >= beta:
+                return beta
+
+            alpha = max(alpha, evaluation)
+
+        return alpha
+
+    def search(
+        self,
+        board: Board,
+        depth: int,
+        alpha,
+        beta,
+        start_time,
+        time_limit,
+        ply=0,
+        stand_pat=None,
+    ) -> float:
+        self.stats.nodes += 1
+        board.update_state()
+
+        self.nodes_until_time_check -= 1
+        if self.nodes_until_time_check <= 0:
+            self.check_time(start_time, time_limit)
+
+        if self.should_cut_off:
+            return 0
+
+        if (
+            board.is_playing
+            and (board.blue | board.red).bit_count() <= TABLEBASE.max_pieces
+        ):
+            result = probe_tablebase(board)
+
+            if result is not None:
+                return tablebase_score(*result)
+
+        key = board.key
+        entry = self.transposition_table.probe(key)
+
+        if entry is not None and entry[1] >= depth:
+            entry_score, flag = entry[2], entry[3]
+
+            if (
+                flag == EXACT
+                or (flag == LOWER_BOUND and entry_score >= beta)
+                or (flag == UPPER_BOUND and entry_score <= alpha)
+            ):
+                return entry_score
+
+        if not board.is_playing:
+            score = board.score
+
+            # draws depend on the moves played before so only wins are stored
+            if board.winner is not None:
+                self.transposition_table.store(key, depth, score, EXACT)
+            return score
+
+        if depth == 0:
+            score = self.search_all_captures(
+                board, alpha, beta, start_time, time_limit, stand_pat=stand_pat
+            )
+
+            if not self.should_cut_off:
+                flag = bound_type(score, alpha, beta)
+                self.transposition_table.store(key, depth, score, flag)
+            return score
+
+        all_moves = self.move_buffers[ply]
+        all_moves[:] = legal_moves(board)
+        self.order_moves(board, all_moves, entry[4] if entry is not None else None, ply)
+
+        original_alpha = alpha
+        best_move = None
+        killers = self.killer_moves[ply]
+        stand_pats = leaf_evaluations(board, all_moves) if depth == 1 else None
+
+        for index, move in enumerate(all_moves):
+            child_stand_pat = stand_pats[index] if stand_pats is not None else None
+            play_move(board, move)
+
+            if index == 0:
+                evaluation = -self.search(
+                    board,
+                    depth - 1,
+                    -beta,
+                    -alpha,
+                    start_time,
+                    time_limit,
+                    ply + 1,
+                    child_stand_pat,
+                )
+            else:
+                # the later moves only have to prove they are worse than the
+                # best one so far, with a null window & maybe a reduced depth
+                reduction = 0
+                if (
+                    USE_LATE_MOVE_REDUCTIONS
+                    and depth >= LMR_MIN_DEPTH
+                    and index >= LMR_MIN_MOVE_INDEX
+                    and not move >> CAPTURES_SHIFT
+                    and not move & KING_FLAG
+                    and move not in killers
+                ):
+                    reduction = 1 if index < LMR_DEEP_MOVE_INDEX else 2
+
+                null_beta = beta
+                if USE_PRINCIPAL_VARIATION_SEARCH and alpha != -inf:
+                    null_beta = min(beta, alpha + NULL_WINDOW)
+
+                evaluation = -self.search(
+                    board,
+                    depth - 1 - reduction,
+                    -null_beta,
+                    -alpha,
+                    start_time,
+                    time_limit,
+                    ply + 1,
+                    None if reduction else child_stand_pat,
+                )
+
+                if reduction and evaluation > alpha:
+                    self.stats.lmr_researches += 1
+                    evaluation = -self.search(
+                        board,
+                        depth - 1,
+                        -null_beta,
+                        -alpha,
+                        start_time,
+                        time_limit,
+                        ply + 1,
+                    )
+
+                if null_beta < beta and evaluation > alpha:
+                    self.stats.pvs_researches += 1
+                    evaluation = -self.search(
+                        board,
+                        depth - 1,
+                        -beta,
+                        -alpha,
+                        start_time,
+                        time_limit,
+                        ply + 1,
+                        child_stand_pat,
+                    )
+
+            board.undo_move()
+
+            if self.should_cut_off:
+                # the result of an unfinished search must not be stored
+                return 0
+
+            if evaluation >= beta:
+                self.record_cutoff(move, depth, ply, index)
+                self.transposition_table.store(key, depth, beta, LOWER_BOUND, move)
+                return beta
+
+            if evaluation > alpha:
+                alpha = evaluation
+                best_move = move
+
+        flag = EXACT if alpha > original_alpha else UPPER_BOUND
+        self.transposition_table.store(key, depth, alpha, flag, best_move)
+
+        return alpha
+
+    def check_time(self, start_time: float, time_limit: float):
+        """Reads the clock & cuts the search off when the time is up,
+        the search calls it every TIME_CHECK_INTERVAL nodes
+
+        Args:
+            start_time (float): the start_time
+            time_limit (float): the time limit for the search
+        """
+        self.nodes_until_time_check = TIME_CHECK_INTERVAL
+
+        now = time.monotonic()
+        if now - start_time > time_limit or now > self.stop_time:
+            self.should_cut_off = True
+
+        if self.cancel_token is not None and self.cancel_token.is_set():
+            self.should_cut_off = True
+
+    def order_moves(
+        self, board: Board, all_moves: list[int], hash_move: int | None, ply: int
+    ):
+        """Sorts the moves so the ones most likely to cause a cutoff
+        come first: the move from the transposition table, then the
+        captures (the more kings killed the better), the killer moves
+        of the ply, the quiet moves that make a king & then the rest
+        of the quiet moves by their history score
+
+        Args:
+            board (Board): the board
+            all_moves (list[int]): the move codes to sort
+            hash_move (int | None): the best move stored for the position
+            ply (int): the distance from the root
+        """
+        killers = self.killer_moves[ply]
+
+        def score_move(move: int):
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+
+            captures = move >> CAPTURES_SHIFT
+
+            if captures:
+                weak_piece = abs(board.piece(move & 63)) == 1
+                on_kill_king = 4 if weak_piece else 2
+
+                killed_kings = (captures & board.kings).bit_count()
+                move_score = 2 * (captures.bit_count() - killed_kings)
+                move_score += on_kill_king * killed_kings
+
+                if move & KING_FLAG:
+                    move_score += 3
+
+                return CAPTURE_SCORE + move_score
+
+            if move == killers[0]:
+                return KILLER_SCORE
+            if move == killers[1]:
+                return KILLER_SCORE - 1
+            if move & KING_FLAG:
+                return KILLER_SCORE - 2
+
+            return self.history[move & 0xFFF]
+
+        all_moves.sort(key=score_move, reverse=True)
+
+    def record_cutoff(self, move: int, depth: int, ply: int, index: int):
+        """Updates the cutoff counters & remembers a quiet move that
+        caused a cutoff as a killer of the ply & in the history table
+
+        Args:
+            move (int): the move code
+            depth (int): the depth left at the position
+            ply (int): the distance from the root
+            index (int): the position of the move in the ordered moves
+        """
+        self.stats.beta_cutoffs += 1
+
+        if index == 0:
+            self.stats.first_move_cutoffs += 1
+
+        if move >> CAPTURES_SHIFT:
+            return
+
+        killers = self.killer_moves[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        # the start & end of the move index the history table
+        self.history[move & 0xFFF] += depth * depth
+
+    def age_history(self):
+        """Halves the history scores & clears the killer moves
+        so a new search prefers what it learns itself"""
+        for index, value in enumerate(self.history):
+            if value:
+                self.history[index] = value >> 1
+
+        for killers in self.killer_moves:
+            killers[0] = killers[1] = 0
+
+    def search_root(
+        self,
+        board: Board,
+        root_moves: list[int],
+        depth: int,
+        alpha,
+        beta,
+        start_time,
+        time_limit,
+    ) -> tuple[float, int | None]:
+        """Searches every root move to the given depth
+
+        Args:
+            board (Board): the board
+            root_moves (list[int]): the moves to search, in order
+            depth (int): the depth to search to
+            alpha (_type_): the lower end of the window
+            beta (_type_): the upper end of the window
+            start_time (_type_): the start_time
+            time_limit (_type_): the time limit for the search
+
+        Returns:
+            tuple[float, int | None]: the score & the index of the best
+                move, which is None when every move failed low
+        """
+        best_index = None
+
+        for index, move in enumerate(root_moves):
+            play_move(board, move)
+
+            null_beta = beta
+            if index > 0 and USE_PRINCIPAL_VARIATION_SEARCH and alpha != -inf:
+                null_beta = min(beta, alpha + NULL_WINDOW)
+
+            evaluation = -self.search(
+                board, depth - 1, -null_beta, -alpha, start_time, time_limit, 1
+            )
+
+            if null_beta < beta and evaluation > alpha:
+                self.stats.pvs_researches += 1
+                evaluation = -self.search(
+                    board, depth - 1, -beta, -alpha, start_time, time_limit, 1
+                )
+
+            board.undo_move()
+
+            if self.should_cut_off:
+                break
+
+            if evaluation >= beta:
+                return beta, index
+
+            if evaluation > alpha:
+                alpha = evaluation
+                best_index = index
+
+        return alpha, best_index
+
+    def is_easy_move(
+        self,
+        board: Board,
+        root_moves: list[int],
+        score: float,
+        depth: int,
+        start_time,
+        time_limit,
+    ) -> bool:
+        """Checks if the first root move is clearly better than
+        all the others by proving with a shallower null window
+        search that none of them gets within EASY_MOVE_MARGIN of it
+
+        Args:
+            board (Board): the board
+            root_moves (list[int]): the root moves with the best one first
+            score (float): the score of the best move
+            depth (int): the depth the best move was searched to
+            start_time (_type_): the start_time
+            time_limit (_type_): the time limit for the search
+
+        Returns:
+            bool: whether the first move is clearly the best
+        """
+        threshold = score - EASY_MOVE_MARGIN
+
+        for move in root_moves[1:]:
+            play_move(board, move)
+            evaluation = -self.search(
+                board, depth // 2, -threshold, 1 - threshold, start_time, time_limit, 1
+            )
+            board.undo_move()
+
+            if self.should_cut_off or evaluation >= threshold:
+                return False
+
+        return True
+
+    def iterative_deepening(
+        self,
+        board: Board,
+        time_limit: float,
+        root_moves: list[int] | None = None,
+        max_depth: int = MAX_PLY - 1,
+        min_depth: int = 1,
+        soft_limit: float | None = None,
+    ) -> tuple[int, float, int]:
+        """This is the Function that using iterative_deepening
+        searches all the root moves deeper and deeper until the
+        given time limit is reached. Every iteration searches the
+        best move of the last one first, inside an aspiration window
+        around its score, and the best move of the last completed
+        iteration is the one returned.
+
+        The time limit is the hard limit where the search is cut off,
+        no new iteration is started after the soft limit (see
+        time_manager.py) which grows every time the best move changes.
+
+        Every call starts new statistics in the stats of the engine,
+        which are filled in while searching.
+
+        Args:
+            board (Board): the board
+            time_limit (float): the time limit for the search
+            root_moves (list[int] | None, optional): the moves to search.
+                Defaults to all the legal moves.
+            max_depth (int, optional): the deepest iteration. Defaults to MAX_PLY - 1.
+            min_depth (int, optional): the first iteration. Defaults to 1.
+            soft_limit (float | None, optional): the time the search should
+                take. Defaults to the time limit.
+
+        Returns:
+            tuple[int, float, int]: best move code, score, depth searched
+        """
+        start_time = time.monotonic()
+        self.should_cut_off = False
+        self.nodes_until_time_check = TIME_CHECK_INTERVAL
+
+        self.stats = SearchStats()
+        self.stats.start(self.transposition_table)
+
+        if soft_limit is None:
+            soft_limit = time_limit
+
+        if root_moves is None:
+            root_moves = list(legal_moves(board))
+
+        best_move = root_moves[0]
+        score = 0
+        depth_searched = 0
+        stable_iterations = 0
+
+        self.age_history()
+
+        for depth in range(min_depth, max_depth + 1):
+            iteration_start = time.monotonic()
+            window = ASPIRATION_WINDOW
+            alpha, beta = -inf, inf
+
+            if depth > min_depth and abs(score) != inf:
+                alpha, beta = score - window, score + window
+
+            while True:
+                search_score, index = self.search_root(
+                    board, root_moves, depth, alpha, beta, start_time, time_limit
+                )
+
+                if self.should_cut_off:
+                    break
+
+                # a full window cannot fail, a won game scores beta & when
+                # every move loses none beats alpha so the first one is kept
+                if alpha == -inf and beta == inf:
+                    index = 0 if index is None else index
+                    break
+
+                failed_low = index is None
+                failed_high = not failed_low and search_score >= beta
+
+                if not failed_low and not failed_high:
+                    break
+
+                # the score is outside of the window so widen it & search again
+                window *= 4
+                if window > MAX_ASPIRATION_WINDOW:
+                    alpha, beta = -inf, inf
+                elif failed_low:
+                    alpha = score - window
+                else:
+                    beta = score + window
+
+            if self.should_cut_off:
+                break
+
+            # the best move is searched first in the next iteration
+            move = root_moves.pop(index)  # type: ignore
+            root_moves.insert(0, move)
+
+            if move == best_move:
+                stable_iterations += 1
+            else:
+                stable_iterations = 0
+
+                # an unstable best move needs more time to be sure of
+                if depth_searched > 0:
+                    soft_limit = min(time_limit, soft_limit * BEST_MOVE_CHANGE_RATIO)
+
+            best_move, score, depth_searched = move, search_score, depth
+
+            self.transposition_table.store(board.key, depth, score, EXACT, move)
+
+            now = time.monotonic()
+            self.stats.end_iteration(depth, now - iteration_start)
+
+            # cut of if found winning move
+            if score >= WIN_CUT_OFF:
+                break
+
+            # the next iteration would not finish in the time left
+            if now - start_time > soft_limit * NEXT_ITERATION_TIME_RATIO:
+                break
+
+            if now > self.soft_stop_time:
+                break
+
+            if (
+                depth >= EASY_MOVE_MIN_DEPTH
+                and stable_iterations >= EASY_MOVE_STABILITY
+                and self.is_easy_move(
+                    board, root_moves, score, depth, start_time, time_limit
+                )
+            ):
+                break
+
+        self.stats.finish(
+            self.transposition_table,
+            best_move,
+            score,
+            depth_searched,
+            time.monotonic() - start_time,
+        )
+        return best_move, score, depth_searched
+
+    def predicted_move(self, board: Board) -> int | None:
+        """Guesses the move the opponent will play, the best move stored
+        for the position or else the first one in the move ordering
+
+        Args:
+            board (Board): the board
+
+        Returns:
+            int | None: the move code or None if there are no moves
+        """
+        all_moves = list(legal_moves(board))
+        if not all_moves:
+            return None
+
+        entry = self.transposition_table.probe(board.key)
+        if entry is not None and entry[4] in all_moves:
+            return entry[4]
+
+        self.order_moves(board, all_moves, None, 0)
+        return all_moves[0]
+
+    def search_best_move(
+        self, real_board: Board, wait_time: float, soft_limit: float | None = None
+    ) -> tuple[Move, SearchStats]:
+        """This is the high level function that when given
+        a board and the time limit it can search
+        using iterative deepening it searches for it until
+        the given time limit is reached after which it returns
+        the best move. The moves are searched on the given board
+        and undone so it is left as it was.
+
+        Args:
+            real_board (Board): the board to search the best move
+            wait_time (float): the wait time the ai can afford
+            soft_limit (float | None, optional): the time the search
+                should take. Defaults to the wait time.
+
+        Returns:
+            tuple[Move, SearchStats]: best move & the statistics of the search
+        """
+        all_moves = list(legal_moves(real_board))
+
+        if len(all_moves) == 1:  # killing move only
+            return Move.from_code(all_moves[0]), SearchStats("forced")
+
+        book_move = OPENING_BOOK.choose(real_board)
+        if book_move is not None:
+            return Move.from_code(book_move), SearchStats("book")
+
+        tablebase_move = best_tablebase_move(real_board, all_moves)
+        if tablebase_move is not None:
+            stats = SearchStats("tablebase")
+            stats.nodes = len(all_moves)
+            return Move.from_code(tablebase_move), stats
+
+        best_move, _, _ = self.iterative_deepening(
+            real_board, wait_time, all_moves, soft_limit=soft_limit
+        )
+
+        return Move.from_code(best_move), self.stats
+
+
+# the engine of search_best_move & of everything that does
+# not bring its own engine
+DEFAULT_ENGINE = SearchEngine()
+
+
+def search_best_move(
+    real_board: Board, wait_time: float, soft_limit: float | None = None
+) -> tuple[Move, SearchStats]:
+    """Searches the best move with DEFAULT_ENGINE, see
+    SearchEngine.search_best_move
 
     Args:
         real_board (Board): the board to search the best move
-        wait_time (int): the wait time the ai can afford
+        wait_time (float): the wait time the ai can afford
+        soft_limit (float | None, optional): the time the search
+            should take. Defaults to the wait time.
 
     Returns:
-        tuple[Move, int, int]: best move, positions checked, max depth
+        tuple[Move, SearchStats]: best move & the statistics of the search
     """
-    global POSITIONS, TRANSPOSITION_TABLE
-
-    best_score = -inf
-    all_moves = generate_moves(real_board)
-    best_move = all_moves[0]
-
-    if len(all_moves) == 1:  # killing move only
-        return best_move, 0, 0
-
-    POSITIONS = 0
-    positions = 0
-    depth = 1
-
-    # calculating time for searching each move
-    search_time_limit = wait_time / len(all_moves)
-
-    for move in all_moves:
-        board = deepcopy(real_board)
-
-        move.play(board)
-        search_score, search_depth = iterative_deepening(board, search_time_limit)
-
-        # found win move
-        if search_score >= WIN_CUT_OFF:
-            return best_move, depth, positions
-
-        is_best_score = search_score >= best_score
-
-        # update values if is the best score
-        if is_best_score:
-            best_score = search_score
-
-        depth = max(search_depth, depth)
-        positions = POSITIONS
-        best_move = move
-
-        board.undo_move()
-
-    return best_move, positions, depth
+    return DEFAULT_ENGINE.search_best_move(real_board, wait_time, soft_limit)
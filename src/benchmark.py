@@ -0,0 +1,255 @@
+"""Contains the search benchmark: a fixed set of positions which
+are each searched to a fixed depth & for a fixed time with fresh
+tables, recording the nodes, the time to the depth, the nodes per
+second, the transposition table hit rate & the best move.
+
+The results are written to a JSON file & can be compared with the
+file of an earlier run, every number that got worse by more than
+the threshold is flagged as a regression.
+
+    python -m src.benchmark --output new.json --compare old.json
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+from math import inf
+
+from . import ai
+from .move import MOVE_CACHE, legal_moves, move_name
+from .perft import make_board
+from .utils import PieceTypes
+
+BENCHMARK_DEPTH = 8
+BENCHMARK_TIME = 2
+REGRESSION_THRESHOLD = 0.1
+
+# the positions are set up like the perft positions (see perft.py)
+BENCHMARK_POSITIONS = {
+    "opening": {"board": None, "side": PieceTypes.BLUE},
+    "early": {
+        "blue": "f5 h5 a6 b7 d7 f7 h7 a8 c8 e8 g8",
+        "red": "b1 f1 h1 a2 e2 g2 b3 d3 f3 h3",
+        "side": PieceTypes.BLUE,
+    },
+    "middlegame": {
+        "blue": "a4 f5 c6 h7 a8 c8 e8 g8",
+        "red": "d1 h1 a2 c2 e2 g2 b3 h3 h5 e6",
+        "side": PieceTypes.BLUE,
+    },
+    "late middlegame": {
+        "blue": "c2 f5 e6 d7 a8 e8 g8",
+        "red": "h1 e2 g2 h3 g4 h5",
+        "side": PieceTypes.BLUE,
+    },
+    "king endgame": {
+        "blue": "a6 b7",
+        "blue kings": "c2 b3 c4",
+        "red": "g6",
+        "red kings": "e8 g8",
+        "side": PieceTypes.RED,
+    },
+    "kings against a king": {
+        "blue": "f3",
+        "blue kings": "h3 e6",
+        "red": "b1",
+        "red kings": "a8",
+        "side": PieceTypes.BLUE,
+    },
+}
+
+
+def run_search(position: dict, time_limit: float, max_depth: int) -> dict:
+    """Searches one position with fresh tables
+
+    Args:
+        position (dict): the position
+        time_limit (float): the time limit of the search
+        max_depth (int): the deepest iteration
+
+    Returns:
+        dict: the results of the search
+    """
+    board = make_board(position)
+
+    # everything the engine remembers between searches is cleared,
+    # the shared move cache too, so every benchmark search starts
+    # the same way
+    engine = ai.DEFAULT_ENGINE
+    engine.reset()
+    MOVE_CACHE.clear()
+
+    start_time = time.perf_counter()
+    best_move, score, depth = engine.iterative_deepening(
+        board, time_limit, list(legal_moves(board)), max_depth
+    )
+    time_taken = time.perf_counter() - start_time
+
+    stats = engine.stats
+    return {
+        "depth": depth,
+        "nodes": stats.total_nodes,
+        "quiescence_nodes": stats.quiescence_nodes,
+        "time": round(time_taken, 4),
+        "nps": round(stats.total_nodes / time_taken),
+        "tt_hit_rate": round(stats.tt_hit_rate, 4),
+        "first_move_cutoff_rate": round(stats.first_move_cutoff_rate, 4),
+        "effective_branching_factor": round(stats.effective_branching_factor, 2),
+        "best_move": move_name(best_move),
+        "score": score if abs(score) != inf else str(score),
+    }
+
+
+def run_benchmark(
+    depth: int = BENCHMARK_DEPTH, time_limit: float = BENCHMARK_TIME, names=None
+) -> dict:
+    """Runs every benchmark position to the fixed depth & for the fixed time
+
+    Args:
+        depth (int, optional): the fixed depth. Defaults to BENCHMARK_DEPTH.
+        time_limit (float, optional): the fixed time. Defaults to BENCHMARK_TIME.
+        names (list[str] | None, optional): the positions to run.
+            Defaults to all of them.
+
+    Returns:
+        dict: the settings & the results of every position
+    """
+    results = {}
+
+    for name in names or BENCHMARK_POSITIONS:
+        position = BENCHMARK_POSITIONS[name]
+        results[name] = {
+            "fixed_depth": run_search(position, inf, depth),
+            "fixed_time": run_search(position, time_limit, ai.MAX_PLY - 1),
+        }
+
+    return {
+        "settings": {
+            "depth": depth,
+            "time": time_limit,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "tablebase_pieces": ai.TABLEBASE.max_pieces,
+        },
+        "positions": results,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """Finds the results that got worse by more than the threshold
+
+    Args:
+        old (dict): the results of the earlier run
+        new (dict): the results of this run
+        threshold (float, optional): the allowed change as a fraction.
+            Defaults to REGRESSION_THRESHOLD.
+
+    Returns:
+        list: (position, search, measure, old value, new value) of every regression
+    """
+    regressions = []
+
+    # the measures where more is worse & where less is worse
+    worse_if_higher = {"fixed_depth": ("nodes", "time")}
+    worse_if_lower = {"fixed_depth": ("nps",), "fixed_time": ("nps", "depth")}
+
+    for name, searches in new["positions"].items():
+        if name not in old["positions"]:
+            continue
+
+        for search, result in searches.items():
+            before = old["positions"][name].get(search)
+            if before is None:
+                continue
+
+            for measure in worse_if_higher.get(search, ()):
+                if result[measure] > before[measure] * (1 + threshold):
+                    regressions.append(
+                        (name, search, measure, before[measure], result[measure])
+                    )
+
+            for measure in worse_if_lower.get(search, ()):
+                if result[measure] < before[measure] * (1 - threshold):
+                    regressions.append(
+                        (name, search, measure, before[measure], result[measure])
+                    )
+
+    return regressions
+
+
+def print_results(results: dict, old: dict | None = None):
+    """Prints the results, next to the earlier ones if there are any"""
+    print(
+        f"{'position':<20} {'search':<12} {'depth':>5} {'nodes':>9} {'time':>8} "
+        f"{'nps':>8} {'tt hit':>7} {'move':>6}"
+    )
+
+    for name, searches in results["positions"].items():
+        for search, result in searches.items():
+            print(
+                f"{name:<20} {search:<12} {result['depth']:>5} {result['nodes']:>9} "
+                f"{result['time']:>8.3f} {result['nps']:>8} "
+                f"{result['tt_hit_rate']:>7.1%} {result['best_move']:>6}"
+            )
+
+            if old is None or name not in old["positions"]:
+                continue
+
+            before = old["positions"][name].get(search)
+            if before is not None:
+                print(
+                    f"{'':<20} {'(before)':<12} {before['depth']:>5} "
+                    f"{before['nodes']:>9} {before['time']:>8.3f} {before['nps']:>8} "
+                    f"{before['tt_hit_rate']:>7.1%} {before['best_move']:>6}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search benchmark")
+    parser.add_argument("--depth", type=int, default=BENCHMARK_DEPTH)
+    parser.add_argument("--time", type=float, default=BENCHMARK_TIME)
+    parser.add_argument(
+        "--position",
+        choices=list(BENCHMARK_POSITIONS),
+        action="append",
+        help="the positions to run, all by default",
+    )
+    parser.add_argument("--output", default="benchmark.json", help="the results file")
+    parser.add_argument("--compare", help="the results file of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="the change (as a fraction) that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmark(args.depth, args.time, args.position)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=4)
+
+    old = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            old = json.load(file)
+
+    print_results(results, old)
+
+    if old is None:
+        return
+
+    regressions = compare(old, results, args.threshold)
+    for name, search, measure, before, after in regressions:
+        print(f"REGRESSION {name} {search} {measure}: {before} -> {after}")
+
+    if regressions:
+        sys.exit(1)
+
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Contains the lookup data for the bitboard representation
+of the board. Only the 32 dark squares can ever hold a piece
+so each side is stored as a 32-bit mask where bit 0 is the
+top left dark square (index 1) and bit 31 the bottom right
+dark square (index 62).
+"""
+
+FULL_MASK = (1 << 32) - 1
+
+# conversions between the 64 square index and the 32 bit index
+SQUARE_TO_BIT: list[int | None] = []
+BIT_TO_SQUARE: list[int] = []
+
+for index in range(64):
+    if (index // 8 + index % 8) % 2 == 0:
+        SQUARE_TO_BIT.append(None)
+        continue
+
+    SQUARE_TO_BIT.append(len(BIT_TO_SQUARE))
+    BIT_TO_SQUARE.append(index)
+
+del index
+
+# how far each dark square is from the 4 center squares
+# (in files + ranks) which the evaluation uses to centralise pieces
+CENTER_DISTANCE = [
+    max(3 - square % 8, square % 8 - 4) + max(3 - square // 8, square // 8 - 4)
+    for square in BIT_TO_SQUARE
+]
+
+# rows 0 - 2 belong to red & rows 5 - 7 belong to blue
+RED_START_MASK = (1 << 12) - 1
+BLUE_START_MASK = FULL_MASK ^ ((1 << 20) - 1)
+
+# the bits in the rows where red & blue men become kings
+RED_KING_ROW = FULL_MASK ^ ((1 << 28) - 1)
+BLUE_KING_ROW = (1 << 4) - 1
+
+# the bits on even rows (0, 2, 4, 6) and odd rows (1, 3, 5, 7)
+EVEN_ROWS = sum(0xF << (row * 4) for row in range(0, 8, 2))
+ODD_ROWS = FULL_MASK ^ EVEN_ROWS
+
+# the directions follow settings.DIRECTIONAL_OFFSET which is
+# (7, 9, -7, -9) ie down left, down right, up right & up left.
+# as the dark squares shift by one column on every row, a single
+# step is a different shift for pieces on even & odd rows
+STEP_SHIFTS = ((4, 3), (5, 4), (-3, -4), (-4, -5))
+
+# a jump always moves two rows so it is the same shift for both rows
+JUMP_SHIFTS = (7, 9, -7, -9)
+
+# the directions each kind of piece can move in
+RED_DIRECTIONS = (0, 1)
+BLUE_DIRECTIONS = (2, 3)
+KING_DIRECTIONS = (0, 1, 2, 3)
+
+
+def _build_masks(distance: int) -> tuple[int, int, int, int]:
+    """Builds the masks of bits which can travel the given
+    distance in each of the directions without leaving the board"""
+    masks = [0, 0, 0, 0]
+    directions = ((1, -1), (1, 1), (-1, 1), (-1, -1))
+
+    for bit, square in enumerate(BIT_TO_SQUARE):
+        row, column = divmod(square, 8)
+
+        for direction, (row_step, column_step) in enumerate(directions):
+            if (
+                0 <= row + row_step * distance < 8
+                and 0 <= column + column_step * distance < 8
+            ):
+                masks[direction] |= 1 << bit
+
+    return tuple(masks)  # type: ignore
+
+
+# the bits that can make a single step / a jump in each direction
+STEP_MASKS = _build_masks(1)
+JUMP_MASKS = _build_masks(2)
+
+
+def shift(mask: int, amount: int) -> int:
+    """Shifts a mask to the left for positive amounts
+    and to the right for negative amounts"""
+    if amount > 0:
+        return (mask << amount) & FULL_MASK
+    return mask >> -amount
+
+
+def step(mask: int, direction: int) -> int:
+    """Moves every bit in the mask one step in the direction,
+    bits that would leave the board are dropped"""
+    mask &= STEP_MASKS[direction]
+    even_shift, odd_shift = STEP_SHIFTS[direction]
+    return shift(mask & EVEN_ROWS, even_shift) | shift(mask & ODD_ROWS, odd_shift)
+
+
+def iterate_bits(mask: int):
+    """Iterates over the set bits of a mask from the lowest to the highest"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
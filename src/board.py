@@ -1,26 +1,65 @@
 """Contains the Board class
 """
 
-import numpy as np
 from math import inf
-from .move import generate_sliding_moves, generate_attacking_moves
+from .bitboard import (
+    BIT_TO_SQUARE,
+    BLUE_START_MASK,
+    CENTER_DISTANCE,
+    RED_START_MASK,
+    SQUARE_TO_BIT,
+    iterate_bits,
+)
+from .move import (
+    CAPTURES_SHIFT,
+    KING_FLAG,
+    attacking_move_codes,
+    legal_moves,
+    sliding_move_codes,
+)
 from .utils import PieceTypes, POSITION_NOTATIONS
+from .zobrist import PIECE_KEYS, SIDE_KEY
+
+# the game is a draw after this many moves in a row without a kill
+MOVES_WITHOUT_KILLS_DRAW = 40
 
 
 class Board:
     """The Board Class contains the
     board to play the game on
+
+    The position is stored as three 32-bit masks over the
+    dark squares (see bitboard.py): `blue` & `red` hold the
+    pieces of each side and `kings` marks which of them are kings
+
+    `key` is the Zobrist hash of the position (including the
+    side to play) and is updated on every change to the board
+
+    `material` (sum of the pieces, kings count double) and
+    `center_distance` (distance of blue pieces from the center
+    minus that of red pieces) are running sums for the evaluation
+    and are updated the same way
     """
 
     def __init__(self, board, current_side: PieceTypes = PieceTypes.BLUE):
+        self.blue = 0
+        self.red = 0
+        self.kings = 0
+        self.key = 0
+        self.material = 0
+        self.center_distance = 0
+        self.current_side = current_side
+        self.__mobility: tuple[int, int] | None = None
+
         if board is None:
-            self.__board = np.zeros(64, dtype=np.dtype(int))
             self.__default_arrange_pieces()
 
         else:
-            self.__board = np.array(board, dtype=np.dtype(int))
+            for index, piece in enumerate(board):
+                if piece != 0:
+                    self.__set_piece(index, int(piece))
 
-        self.current_side = current_side
+        self.key = self.compute_key()
         self.__made_moves = []
 
         self.is_playing = True
@@ -31,6 +70,7 @@ class Board:
         """Resets the Board to the initial state"""
         self.__default_arrange_pieces()
         self.current_side = PieceTypes.BLUE
+        self.key = self.compute_key()
         self.__made_moves = []
 
         self.is_playing = True
@@ -43,9 +83,9 @@ class Board:
         them as an iterator where each element is a tuple
         that is in the form of (piece, index)"""
 
-        indices = np.where(self.__board != 0)[0]
-        pieces = map(lambda x: (self.__board[x], x), indices)
-        return pieces
+        for bit in iterate_bits(self.blue | self.red):
+            index = BIT_TO_SQUARE[bit]
+            yield self.piece(index), index
 
     def piece(self, index: int) -> int:
         """Gets a Piece from the board
@@ -55,37 +95,76 @@ class Board:
 
         Returns: the piece
         """
-        return self.__board[index]
+        bit = SQUARE_TO_BIT[index]
+        if bit is None:
+            return 0
 
-    def __default_arrange_pieces(self):
-        """Sets up the board pieces"""
-        self.__board = np.zeros(64, dtype=np.dtype(int))
+        mask = 1 << bit
+        value = 2 if self.kings & mask else 1
 
-        # setup red pieces
-        for i in range(3):
-            is_even = i % 2 == 0
-            for j in range(4):
+        if self.blue & mask:
+            return value
+        if self.red & mask:
+            return -value
+        return 0
 
-                row = i
-                column = j * 2
-                if is_even:
-                    column += 1
+    def __set_piece(self, index: int, piece: int):
+        """Puts a piece on an empty dark square
 
-                index = (row * 8) + column
-                self.__board[index] = -1
+        Args:
+            index (int): the position of the piece
+            piece (int): the piece
+        """
+        bit: int = SQUARE_TO_BIT[index]  # type: ignore
+        mask = 1 << bit
+        self.key ^= PIECE_KEYS[piece][bit]
+        self.material += piece
+
+        if piece > 0:
+            self.blue |= mask
+            self.center_distance += CENTER_DISTANCE[bit]
+        else:
+            self.red |= mask
+            self.center_distance -= CENTER_DISTANCE[bit]
 
-        # setup blue pieces
-        for i in range(5, 8):
-            is_even = i % 2 == 0
-            for j in range(4):
+        if abs(piece) == 2:
+            self.kings |= mask
 
-                row = i
-                column = j * 2
-                if is_even:
-                    column += 1
+    def __remove_piece(self, index: int) -> int:
+        """Removes a piece from the board
 
-                index = (row * 8) + column
-                self.__board[index] = 1
+        Args:
+            index (int): the position of the piece
+
+        Returns:
+            int: the removed piece
+        """
+        piece = self.piece(index)
+        bit: int = SQUARE_TO_BIT[index]  # type: ignore
+        mask = ~(1 << bit)
+        self.key ^= PIECE_KEYS[piece][bit]
+        self.material -= piece
+
+        if piece > 0:
+            self.center_distance -= CENTER_DISTANCE[bit]
+        else:
+            self.center_distance += CENTER_DISTANCE[bit]
+
+        self.blue &= mask
+        self.red &= mask
+        self.kings &= mask
+
+        return piece
+
+    def __default_arrange_pieces(self):
+        """Sets up the board pieces"""
+        self.red = RED_START_MASK
+        self.blue = BLUE_START_MASK
+        self.kings = 0
+
+        # both sides are mirror images of each other so the sums cancel out
+        self.material = 0
+        self.center_distance = 0
 
     @property
     def last_move(self) -> list | None:
@@ -119,20 +198,19 @@ class Board:
             IndexError: If you try to move the piece to an occupied position
             IndexError: If you try to move a non existent piece
         """
-        if self.__board[new_index] != 0:
+        if self.piece(new_index) != 0:
             raise IndexError("You cant move a piece to an occupied square")
 
-        if self.__board[old_index] == 0:
+        if self.piece(old_index) == 0:
             raise IndexError("You cant move a non existent piece!")
 
-        piece = self.__board[old_index]
-        self.__board[old_index] = 0
-        self.__board[new_index] = piece
+        self.__set_piece(new_index, self.__remove_piece(old_index))
 
         self.__made_moves.append(
             [old_index, new_index, [], False, self.moves_without_kills]
         )
         self.moves_without_kills += 1
+        self.key ^= SIDE_KEY
 
         if self.current_side == PieceTypes.BLUE:
             self.current_side = PieceTypes.RED
@@ -149,12 +227,11 @@ class Board:
             IndexError: when it tries to kill a piece
                 that is nonexistent
         """
-        if self.__board[index] == 0:
+        if self.piece(index) == 0:
             raise IndexError("Cannot kill a non existent piece")
 
-        self.__made_moves[-1][2].append((index, self.__board[index]))
+        self.__made_moves[-1][2].append((index, self.__remove_piece(index)))
         self.moves_without_kills = 0
-        self.__board[index] = 0
 
     def make_king(self, index: int):
         """Makes a Piece at the given index a king
@@ -172,7 +249,12 @@ class Board:
         if self.piece(index) == 0:
             raise IndexError("You cant king a non existent piece")
 
-        self.__board[index] = self.__board[index] * 2
+        piece = self.piece(index)
+        bit: int = SQUARE_TO_BIT[index]  # type: ignore
+
+        self.kings |= 1 << bit
+        self.key ^= PIECE_KEYS[piece][bit] ^ PIECE_KEYS[piece * 2][bit]
+        self.material += piece
         self.__made_moves[-1][3] = True
 
     def undo_move(self):
@@ -180,16 +262,24 @@ class Board:
         last_move = self.__made_moves.pop()
 
         if last_move[3]:
-            self.__board[last_move[1]] = self.__board[last_move[1]] // 2
+            king = self.piece(last_move[1])
+            bit: int = SQUARE_TO_BIT[last_move[1]]  # type: ignore
+
+            self.kings &= ~(1 << bit)
+            self.key ^= PIECE_KEYS[king][bit] ^ PIECE_KEYS[king // 2][bit]
+            self.material -= king // 2
 
         for (index, piece) in last_move[2]:  # type: ignore
-            self.__board[index] = piece
+            self.__set_piece(index, piece)
 
-        piece = self.__board[last_move[1]]
-        self.__board[last_move[1]] = 0
-        self.__board[last_move[0]] = piece
+        self.__set_piece(last_move[0], self.__remove_piece(last_move[1]))
 
         self.moves_without_kills = last_move[4]
+        self.key ^= SIDE_KEY
+
+        # a move was played from this position so the game was still going on
+        self.is_playing = True
+        self.winner = None
 
         if self.current_side == PieceTypes.BLUE:
             self.current_side = PieceTypes.RED
@@ -201,9 +291,9 @@ class Board:
         """Gives the Board Representation
 
         Returns:
-            numpy array
+            list: the 64 squares of the board
         """
-        return self.__board.tolist()
+        return [self.piece(index) for index in range(64)]
 
     def is_draw(self) -> bool:
         """Check wether or not the board state
@@ -212,7 +302,7 @@ class Board:
         Returns:
             bool: wether or not it is a draw
         """
-        is_draw = self.moves_without_kills >= 40
+        is_draw = self.moves_without_kills >= MOVES_WITHOUT_KILLS_DRAW
 
         if self.current_side == PieceTypes.BLUE:
             try:
@@ -251,7 +341,12 @@ class Board:
 
     def clear(self):
         """Clears the board and makes it empty."""
-        self.__board = np.zeros(64, dtype=np.dtype(int))
+        self.blue = 0
+        self.red = 0
+        self.kings = 0
+        self.material = 0
+        self.center_distance = 0
+        self.key = self.compute_key()
 
     @property
     def score(self) -> int | float:
@@ -267,10 +362,6 @@ class Board:
         # * move piece close to center
         # * make piece king fast
 
-        def endgame_weight(materials: int):
-            multiplier = 1 / 12
-            return 1 - min(1, materials * multiplier)
-
         self.update_state()
 
         opponent = (
@@ -289,56 +380,72 @@ class Board:
             # if it a draw
             return 0
 
+        return self.evaluate()
+
+    def evaluate(self, mobility: bool = True) -> float:
+        """Evaluates the position for the side to play without
+        checking if the game is over. Everything except the mobility
+        comes from the running sums so it only costs a few additions
+
+        Args:
+            mobility (bool, optional): whether to add the mobility
+                of the pieces, which needs their moves. Defaults to True.
+
+        Returns:
+            float: the score of the position
+        """
         # ! score = for blue by default
         # ! for red = score * -1
 
         # increases the longer the game last and the fewer the pieces left
-        no_to_ignore = 20
-        no_of_pieces = np.where(
-            self.__board > 0 if opponent == PieceTypes.RED else self.__board < 0
-        )[0].size
-        weight = endgame_weight(no_of_pieces)
+        is_blue = self.current_side == PieceTypes.BLUE
+        no_of_pieces = (self.blue if is_blue else self.red).bit_count()
+        weight = 1 - min(1, no_of_pieces / 12)
 
         # the more pieces we have compared to the opponent the better
-        score = sum(self.board) * 2 * weight
+        # towards end force my pieces to the center and opponent to edges
+        score = (self.material * 2 - self.center_distance * 0.5) * weight
+
+        if mobility:
+            score += self.mobility
+
+        return score if is_blue else -score
+
+    @property
+    def mobility(self) -> int:
+        """The mobility of blue minus the mobility of red.
+        It is only worked out when it is needed and kept
+        until the position changes
+
+        Returns:
+            int: the mobility score
+        """
+        if self.__mobility is not None and self.__mobility[0] == self.key:
+            return self.__mobility[1]
+
+        score = 0
+        all_moves = []
 
         # the more moves possible the better especially kinging & multi kills
-        # towards end force my pieces to the center and opponent to edges
         for (piece, start) in self.all_pieces:
             piece_score = 0
 
             # more moves & kills the better
+            all_moves.clear()
+            sliding_move_codes(piece, start, self, all_moves)
+            attacking_move_codes(piece, start, self, all_moves)
 
-            all_moves = generate_sliding_moves(
-                piece, start, self.board
-            ) + generate_attacking_moves(piece, start, self.board)
-
-            for move in all_moves:
-                piece_score += 3 * len(move.kills)  # if no kills += 0
+            for code in all_moves:
+                piece_score += 3 * (code >> CAPTURES_SHIFT).bit_count()
                 piece_score += 2
 
-                if move.make_king:
+                if code & KING_FLAG:
                     # making king good
                     piece_score += 5
 
-            # force to the edges & center
-
-            file = start % 8
-            rank = start // 8
-            dist_from_center = (
-                (max(3 - file, file - 4) + max(3 - rank, rank - 4)) * 0.5 * weight
-            )
-
-            piece_score -= dist_from_center
-
-            if piece in PieceTypes.BLUE.value:
-                score += piece_score
-            else:
-                score -= piece_score
-
-        if self.current_side == PieceTypes.RED:
-            score *= -1
+            score += piece_score if piece > 0 else -piece_score
 
+        self.__mobility = (self.key, score)
         return score
 
     def update_state(self):
@@ -350,24 +457,29 @@ class Board:
         if is_draw:
             return
 
-        pieces = self.all_pieces
-        board = self.board  # type: ignore
+        if not legal_moves(self):
+            self.winner = self.current_side.value[0] * -1
+            self.is_playing = False
 
-        for (piece, start) in pieces:
-            if piece in self.current_side.value:
+    def compute_key(self) -> int:
+        """Computes the Zobrist key of the position from scratch.
+        `key` is kept up to date incrementally so this is only
+        needed when the whole board is replaced
 
-                piece_attack_moves = generate_attacking_moves(piece, start, board)
-                piece_sliding_moves = generate_sliding_moves(piece, start, board)
+        Returns:
+            int: the 64 bit key
+        """
+        key = SIDE_KEY if self.current_side == PieceTypes.RED else 0
 
-                if len(piece_attack_moves + piece_sliding_moves) > 0:
-                    break
+        for (piece, index) in self.all_pieces:
+            key ^= PIECE_KEYS[piece][SQUARE_TO_BIT[index]]  # type: ignore
 
-        else:
-            self.winner = self.current_side.value[0] * -1
-            self.is_playing = False
+        return key
 
-    def hash(self):
-        """Hashes the board but tbh
-        just gets the string representation
-        of the board as a list"""
-        return str(self.board)
+    def hash(self) -> int:
+        """Hashes the board
+
+        Returns:
+            int: the Zobrist key of the position
+        """
+        return self.key
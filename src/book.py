@@ -0,0 +1,242 @@
+"""Contains the opening book: the moves worth playing in the
+positions after the start, so the ai does not search them again
+in every game.
+
+The book is a file of fixed size entries sorted by the Zobrist key
+of the position, each one is
+    key (8 bytes), move code (8 bytes), weight (2 bytes), score (4 bytes)
+& a position has one entry for every move in the book. The file is
+memory mapped & searched with a binary search so nothing is loaded.
+
+The book is built by self-play: every game starts from the start
+position & in each position it reaches all the moves are analysed
+with a fixed depth search. The moves within BOOK_MARGIN of the best
+are kept (the closer to the best the higher their weight) and one
+of them is played at random, by weight, to reach the next position.
+
+Run `python -m src.book` to build it.
+"""
+
+import os
+import mmap
+import time
+import random
+import struct
+import argparse
+from math import inf
+
+from .board import Board
+from .move import legal_moves, play_move
+
+OPENING_BOOK_PATH = "./assets/opening_book.bin"
+
+ENTRY = struct.Struct("<QQHf")
+
+BOOK_GAMES = 100
+BOOK_PLIES = 10
+BOOK_DEPTH = 8
+BOOK_MARGIN = 0.25
+MAX_WEIGHT = 100
+
+
+class OpeningBook:
+    """The opening book file, when it is missing the book is empty"""
+
+    def __init__(self, path: str = OPENING_BOOK_PATH):
+        self.path = path
+        self.hits = 0
+        self.__data: mmap.mmap | None = None
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as file:
+                self.__data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            if len(self.__data) % ENTRY.size:
+                raise ValueError(f"{path} is not an opening book")
+
+    def __len__(self) -> int:
+        return len(self.__data) // ENTRY.size if self.__data is not None else 0
+
+    def entries(self, key: int) -> list[tuple[int, int, float]]:
+        """Finds the moves of a position
+
+        Args:
+            key (int): the Zobrist key of the position
+
+        Returns:
+            list[tuple[int, int, float]]: (move code, weight, score) of every move
+        """
+        data = self.__data
+        if data is None:
+            return []
+
+        # the first entry with a key that is not smaller
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+
+            if ENTRY.unpack_from(data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        for index in range(low, len(self)):
+            entry_key, move, weight, score = ENTRY.unpack_from(data, index * ENTRY.size)
+
+            if entry_key != key:
+                break
+            entries.append((move, weight, score))
+
+        return entries
+
+    def choose(self, board, generator=random) -> int | None:
+        """Picks a move of the book for the position at random, by weight
+
+        Args:
+            board (Board): the board
+            generator (optional): the random generator. Defaults to random.
+
+        Returns:
+            int | None: the move code or None if the position is not in the book
+        """
+        # a move is only played if it is legal, in case two keys collide
+        moves = legal_moves(board)
+        entries = [entry for entry in self.entries(board.key) if entry[0] in moves]
+
+        if not entries:
+            return None
+
+        self.hits += 1
+        return generator.choices(
+            [entry[0] for entry in entries], [entry[1] for entry in entries]
+        )[0]
+
+    def close(self):
+        """Closes the memory map"""
+        if self.__data is not None:
+            self.__data.close()
+            self.__data = None
+
+
+def analyse(board: Board, depth: int) -> list[tuple[int, int, float]]:
+    """Searches every move of a position to a fixed depth & keeps
+    the ones within BOOK_MARGIN of the best
+
+    Args:
+        board (Board): the board
+        depth (int): the depth to search every move to
+
+    Returns:
+        list[tuple[int, int, float]]: (move code, weight, score) of the kept moves
+    """
+    from . import ai  # pylint: disable=import-outside-toplevel
+
+    engine = ai.DEFAULT_ENGINE
+
+    scores = []
+    for move in legal_moves(board):
+        engine.should_cut_off = False
+
+        play_move(board, move)
+        score = -engine.search(board, depth - 1, -inf, inf, time.monotonic(), inf, 1)
+        board.undo_move()
+
+        scores.append((move, score))
+
+    best = max(score for _, score in scores)
+    entries = []
+
+    for move, score in scores:
+        # the scores of won games are infinite so they are compared first
+        gap = 0 if score == best else best - score
+
+        if gap <= BOOK_MARGIN:
+            weight = round(MAX_WEIGHT * (1 - gap / (2 * BOOK_MARGIN)))
+            entries.append((move, weight, score))
+
+    return entries
+
+
+def build(
+    games: int = BOOK_GAMES,
+    plies: int = BOOK_PLIES,
+    depth: int = BOOK_DEPTH,
+    seed: int | None = None,
+) -> dict[int, list[tuple[int, int, float]]]:
+    """Builds the book by playing games against itself
+
+    Args:
+        games (int, optional): the games to play. Defaults to BOOK_GAMES.
+        plies (int, optional): the length of every game. Defaults to BOOK_PLIES.
+        depth (int, optional): the depth of the analysis. Defaults to BOOK_DEPTH.
+        seed (int | None, optional): the seed of the games. Defaults to None.
+
+    Returns:
+        dict[int, list[tuple[int, int, float]]]: the kept moves of every position
+    """
+    generator = random.Random(seed)
+    book: dict[int, list[tuple[int, int, float]]] = {}
+
+    for _ in range(games):
+        board = Board(None)
+
+        for _ in range(plies):
+            all_moves = legal_moves(board)
+            if not all_moves:
+                break
+
+            if len(all_moves) == 1:
+                # the ai plays forced moves without searching anyway
+                play_move(board, all_moves[0])
+                continue
+
+            if board.key not in book:
+                book[board.key] = analyse(board, depth)
+
+            entries = book[board.key]
+            move = generator.choices(
+                [entry[0] for entry in entries], [entry[1] for entry in entries]
+            )[0]
+            play_move(board, move)
+
+    return book
+
+
+def write(book: dict[int, list[tuple[int, int, float]]], path: str = OPENING_BOOK_PATH):
+    """Writes a book to a file sorted by key, the best moves first
+
+    Args:
+        book (dict[int, list[tuple[int, int, float]]]): the book
+        path (str, optional): the file. Defaults to OPENING_BOOK_PATH.
+    """
+    with open(path + ".tmp", "wb") as file:
+        for key in sorted(book):
+            for move, weight, score in sorted(book[key], key=lambda entry: -entry[1]):
+                file.write(ENTRY.pack(key, move, weight, score))
+
+    os.replace(path + ".tmp", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Opening book builder")
+    parser.add_argument("--games", type=int, default=BOOK_GAMES)
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES)
+    parser.add_argument("--depth", type=int, default=BOOK_DEPTH)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=OPENING_BOOK_PATH)
+    args = parser.parse_args()
+
+    start_time = time.monotonic()
+    book = build(args.games, args.plies, args.depth, args.seed)
+    write(book, args.output)
+
+    entries = sum(len(entries) for entries in book.values())
+    print(
+        f"{len(book)} positions, {entries} moves, "
+        f"{entries * ENTRY.size} bytes in {time.monotonic() - start_time:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Contains the engine worker: the ai searching in its own process
+so the game loop keeps drawing while it thinks.
+
+The game sends requests to the worker through a queue & polls
+the queue of responses every frame. A request is either a search
+of the best move, answered with the move, or pondering on the
+position after the ai's move (see ponder.py) which gets no answer.
+The worker keeps its transposition table between requests.
+
+The cancel token is an Event the search checks with the clock,
+setting it stops whatever the worker is doing. Every request holds
+the generation it was sent in & cancelling starts a new generation,
+so the requests still waiting in the queue are skipped instead of
+searched. The token is only cleared for a request of the current
+generation.
+"""
+
+import queue
+import multiprocessing
+
+from . import ai
+from .board import Board
+from .move import legal_moves
+from .ponder import Ponderer
+from .stats import SearchStats
+
+SEARCH = "search"
+PONDER = "ponder"
+
+
+def _worker_loop(
+    requests: multiprocessing.Queue,
+    responses: multiprocessing.Queue,
+    cancel_token,
+    generation,
+):
+    """Answers the requests of the game until it gets None
+
+    Args:
+        requests (multiprocessing.Queue): (kind, generation, request id,
+            board, time limit, soft limit) of every request
+        responses (multiprocessing.Queue): (request id, move code,
+            search statistics) of every search
+        cancel_token (multiprocessing.Event): stops the search when set
+        generation (multiprocessing.Value): the generation of the
+            requests that were not cancelled
+    """
+    engine = ai.DEFAULT_ENGINE
+    engine.cancel_token = cancel_token
+    ponderer = Ponderer(engine)
+
+    while True:
+        request = requests.get()
+
+        if request is None:
+            ponderer.stop()
+            return
+
+        kind, request_generation, request_id, board, time_limit, soft_limit = request
+
+        # cancelled while it waited in the queue
+        if request_generation != generation.value:
+            continue
+
+        cancel_token.clear()
+
+        # cancelled while the token was cleared, the cancel
+        # is kept for whatever is still running
+        if request_generation != generation.value:
+            cancel_token.set()
+            continue
+
+        if kind == PONDER:
+            ponderer.start(board)
+            continue
+
+        pondered = None
+        if len(legal_moves(board)) > 1:
+            pondered = ponderer.finish(board, time_limit, soft_limit)
+        else:
+            ponderer.stop()
+
+        if pondered is None:
+            move, stats = engine.search_best_move(board, time_limit, soft_limit)
+            pondered = move.code, stats
+
+        responses.put((request_id,) + pondered)
+
+
+class EngineWorker:
+    """The process the ai searches in & the queues to talk to it"""
+
+    def __init__(self):
+        self.__requests: multiprocessing.Queue = multiprocessing.Queue()
+        self.__responses: multiprocessing.Queue = multiprocessing.Queue()
+        self.__cancel_token = multiprocessing.Event()
+        self.__generation = multiprocessing.Value("i", 0)
+        self.__last_request_id = 0
+
+        self.__process = multiprocessing.Process(
+            target=_worker_loop,
+            args=(
+                self.__requests,
+                self.__responses,
+                self.__cancel_token,
+                self.__generation,
+            ),
+            daemon=True,
+        )
+        self.__process.start()
+
+    def search(self, board: Board, time_limit: float, soft_limit: float) -> int:
+        """Asks the worker for the best move of a position
+
+        Args:
+            board (Board): the board
+            time_limit (float): the hard limit of the search
+            soft_limit (float): the soft limit of the search
+
+        Returns:
+            int: the id of the request, to get its result with
+        """
+        self.__last_request_id += 1
+        self.__requests.put(
+            (
+                SEARCH,
+                self.__generation.value,
+                self.__last_request_id,
+                board,
+                time_limit,
+                soft_limit,
+            )
+        )
+        return self.__last_request_id
+
+    def ponder(self, board: Board):
+        """Asks the worker to ponder on the position after the ai's move"""
+        self.__requests.put((PONDER, self.__generation.value, 0, board, 0, 0))
+
+    def result(self, request_id: int) -> tuple[int, SearchStats] | None:
+        """Gets the result of a search without waiting for it
+
+        Args:
+            request_id (int): the id of the request
+
+        Returns:
+            tuple[int, SearchStats] | None: best move code & the statistics
+                of the search or None if the search is not done yet
+        """
+        while True:
+            try:
+                response = self.__responses.get_nowait()
+            except queue.Empty:
+                return None
+
+            # the results of cancelled searches are thrown away
+            if response[0] == request_id:
+                return response[1:]
+
+    def cancel(self):
+        """Stops the search or the pondering of the worker & skips
+        the requests that are still waiting for it"""
+        # the generation changes before the token is set so
+        # the worker never clears the token of this cancel
+        with self.__generation.get_lock():
+            self.__generation.value += 1
+
+        self.__cancel_token.set()
+
+    def close(self):
+        """Stops the worker process"""
+        self.cancel()
+        self.__requests.put(None)
+        self.__process.join(1)
+
+        if self.__process.is_alive():
+            self.__process.terminate()
@@ -0,0 +1,342 @@
+"""Contains the batched evaluation: Board.evaluate worked out
+for many positions at once with numpy.
+
+A batch of positions is an (N, 3) array of the blue, red & king
+masks (see bitboard.py) with a bool array of which positions have
+blue to play. The boards from Board.board ((N, 64) arrays of pieces)
+can be turned into masks with positions_from_squares.
+
+Every term gives exactly the same score as the Board, including the
+mobility whose capture chains are followed one jump at a time for
+all the chains of all the positions together.
+"""
+
+import numpy as np
+
+from .bitboard import (
+    BIT_TO_SQUARE,
+    BLUE_DIRECTIONS,
+    BLUE_KING_ROW,
+    CENTER_DISTANCE,
+    EVEN_ROWS,
+    FULL_MASK,
+    JUMP_SHIFTS,
+    KING_DIRECTIONS,
+    ODD_ROWS,
+    RED_DIRECTIONS,
+    RED_KING_ROW,
+    SQUARE_TO_BIT,
+    STEP_MASKS,
+    STEP_SHIFTS,
+    step,
+)
+from .move import CAPTURES_SHIFT, END_SHIFT, KING_FLAG
+from .utils import PieceTypes
+
+# the number of set bits of every 16 bit number
+_POPCOUNT_16 = np.array([bin(value).count("1") for value in range(1 << 16)], np.int64)
+
+# the sum of the center distances of the bits of every byte of a mask
+_CENTER_BYTES = np.array(
+    [
+        [
+            sum(CENTER_DISTANCE[8 * byte + bit] for bit in range(8) if value >> bit & 1)
+            for value in range(256)
+        ]
+        for byte in range(4)
+    ],
+    np.int64,
+)
+
+# the most positions scored at once, the capture chains are packed
+# in 64 bit numbers which leaves 21 bits for the position
+BATCH_SIZE = 1 << 20
+
+# the bit next to every bit in every direction, -1 if it is off the board
+_NEIGHBOURS = np.array(
+    [
+        [step(1 << bit, direction).bit_length() - 1 for bit in range(32)] + [-1]
+        for direction in KING_DIRECTIONS
+    ],
+    np.int64,
+)
+
+_BITS = np.arange(32, dtype=np.int64)
+
+_SIDES = (
+    (BLUE_DIRECTIONS, BLUE_KING_ROW),
+    (RED_DIRECTIONS, RED_KING_ROW),
+)
+
+
+def popcount(masks: np.ndarray) -> np.ndarray:
+    """The number of set bits of every 32 bit mask"""
+    return _POPCOUNT_16[masks & 0xFFFF] + _POPCOUNT_16[masks >> 16 & 0xFFFF]
+
+
+def _shift(masks: np.ndarray, amount: int) -> np.ndarray:
+    """bitboard.shift for an array of masks"""
+    if amount > 0:
+        return masks << amount & FULL_MASK
+    return masks >> -amount
+
+
+def _step(masks: np.ndarray, direction: int) -> np.ndarray:
+    """bitboard.step for an array of masks"""
+    masks = masks & STEP_MASKS[direction]
+    even_shift, odd_shift = STEP_SHIFTS[direction]
+    return _shift(masks & EVEN_ROWS, even_shift) | _shift(masks & ODD_ROWS, odd_shift)
+
+
+def positions_from_boards(boards) -> tuple[np.ndarray, np.ndarray]:
+    """Stacks the masks of boards
+
+    Args:
+        boards (Iterable[Board]): the boards
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: the (N, 3) masks & if blue is to play
+    """
+    boards = list(boards)
+    positions = np.array(
+        [(board.blue, board.red, board.kings) for board in boards], np.int64
+    ).reshape(-1, 3)
+    blue_to_play = np.array(
+        [board.current_side == PieceTypes.BLUE for board in boards], bool
+    )
+
+    return positions, blue_to_play
+
+
+def positions_from_squares(squares: np.ndarray) -> np.ndarray:
+    """Turns (N, 64) arrays of pieces (like Board.board) into (N, 3) masks"""
+    pieces = np.asarray(squares)[:, BIT_TO_SQUARE]
+    bits = np.int64(1) << np.arange(32, dtype=np.int64)
+
+    return np.stack(
+        [
+            ((pieces > 0) * bits).sum(axis=1),
+            ((pieces < 0) * bits).sum(axis=1),
+            ((abs(pieces) == 2) * bits).sum(axis=1),
+        ],
+        axis=1,
+    )
+
+
+def material(positions: np.ndarray) -> np.ndarray:
+    """Board.material, the pieces of blue minus red where kings count double"""
+    blue, red, kings = positions[:, 0], positions[:, 1], positions[:, 2]
+    return (
+        popcount(blue) + popcount(blue & kings) - popcount(red) - popcount(red & kings)
+    )
+
+
+def center_distance(positions: np.ndarray) -> np.ndarray:
+    """Board.center_distance, the distance of blue from the center minus red"""
+    distance = np.zeros(len(positions), np.int64)
+
+    for byte in range(4):
+        distance += _CENTER_BYTES[byte][positions[:, 0] >> 8 * byte & 0xFF]
+        distance -= _CENTER_BYTES[byte][positions[:, 1] >> 8 * byte & 0xFF]
+
+    return distance
+
+
+def _chain_scores(
+    number: np.ndarray,
+    start: np.ndarray,
+    kings: np.ndarray,
+    opponents: np.ndarray,
+    occupied: np.ndarray,
+    directions: tuple[int, ...],
+    king_row: int,
+    size: int,
+) -> np.ndarray:
+    """Scores all the complete capture chains of some pieces like
+    Board.mobility does, following every chain one jump at a time
+
+    Args:
+        number (np.ndarray): the position of every piece
+        start (np.ndarray): the bit of every piece
+        kings (np.ndarray): the kings mask of every position
+        opponents (np.ndarray): the opponents mask of every position
+        occupied (np.ndarray): the occupied mask of every position
+        directions (tuple[int, ...]): the directions the men move in
+        king_row (int): the row where the men become kings
+        size (int): the number of positions
+
+    Returns:
+        np.ndarray: the score of the chains of every position
+    """
+    scores = np.zeros(size, np.int64)
+    current, captures = start, np.zeros_like(start)
+
+    while len(number):
+        is_king = kings[number] >> start & 1 == 1
+        is_continued = np.zeros(len(number), bool)
+        chains = []
+
+        for direction in KING_DIRECTIONS:
+            target = _NEIGHBOURS[direction][current]
+            landing = _NEIGHBOURS[direction][target]
+            kill = np.int64(1) << np.maximum(target, 0)
+
+            can_jump = (landing >= 0) & (opponents[number] & kill != 0)
+            can_jump &= captures & kill == 0
+            can_jump &= occupied[number] >> np.maximum(landing, 0) & 1 == 0
+
+            if direction not in directions:
+                can_jump &= is_king
+
+            is_continued |= can_jump
+
+            # the chain packed in one number: position, start, landing & kills
+            chains.append(
+                (number[can_jump] << 42 | start[can_jump] << 37)
+                | (landing[can_jump] << 32 | captures[can_jump] | kill[can_jump])
+            )
+
+        # a chain where the piece cannot kill any more is a move
+        is_complete = ~is_continued & (captures != 0)
+        promotes = ~is_king & (king_row >> current & 1 == 1)
+        chain_scores = 2 + 3 * popcount(captures) + 5 * promotes
+        scores += np.bincount(
+            number[is_complete], chain_scores[is_complete], minlength=size
+        ).astype(np.int64)
+
+        # chains reaching the same square with the same kills are followed once
+        chains = np.unique(np.concatenate(chains))
+        number, start = chains >> 42, chains >> 37 & 31
+        current, captures = chains >> 32 & 31, chains & FULL_MASK
+
+    return scores
+
+
+def mobility(positions: np.ndarray) -> np.ndarray:
+    """Board.mobility, every sliding move & capture chain of every
+    piece scores 2, 3 more for every kill & 5 more for making a king
+
+    Args:
+        positions (np.ndarray): the (N, 3) masks
+
+    Returns:
+        np.ndarray: the mobility of blue minus red
+    """
+    blue, red, kings = positions[:, 0], positions[:, 1], positions[:, 2]
+    occupied = blue | red
+    empty = ~occupied & FULL_MASK
+    size = len(positions)
+
+    score = np.zeros(size, np.int64)
+
+    for (directions, king_row), own, opponents, sign in zip(
+        _SIDES, (blue, red), (red, blue), (1, -1)
+    ):
+        men, own_kings = own & ~kings, own & kings
+        jumpers = np.zeros(size, np.int64)
+
+        for direction in KING_DIRECTIONS:
+            movers = own if direction in directions else own_kings
+            targets = _step(movers, direction)
+            score += sign * 2 * popcount(targets & empty)
+
+            if direction in directions:
+                promotions = _step(men, direction) & empty & king_row
+                score += sign * 5 * popcount(promotions)
+
+            landing = _step(targets & opponents, direction) & empty
+            jumpers |= _shift(landing, -JUMP_SHIFTS[direction])
+
+        if not jumpers.any():
+            continue
+
+        # the chains start from every piece that can make a kill
+        rows = np.flatnonzero(jumpers)
+        row, start = np.nonzero(jumpers[rows, None] >> _BITS & 1)
+        number = rows[row]
+
+        score += sign * _chain_scores(
+            number, start, kings, opponents, occupied, directions, king_row, size
+        )
+
+    return score
+
+
+def evaluate_batch(
+    positions: np.ndarray,
+    blue_to_play: np.ndarray | None = None,
+    with_mobility: bool = True,
+) -> np.ndarray:
+    """Board.evaluate for a batch of positions
+
+    Args:
+        positions (np.ndarray): the (N, 3) masks or (N, 64) pieces
+        blue_to_play (np.ndarray | None, optional): if blue is to play in
+            every position. Defaults to blue in all of them.
+        with_mobility (bool, optional): whether to add the mobility. Defaults to True.
+
+    Returns:
+        np.ndarray: the score of every position for the side to play
+    """
+    positions = np.asarray(positions, np.int64)
+    if positions.shape[1] == 64:
+        positions = positions_from_squares(positions)
+
+    if blue_to_play is None:
+        blue_to_play = np.ones(len(positions), bool)
+
+    if len(positions) > BATCH_SIZE:
+        return np.concatenate(
+            [
+                evaluate_batch(
+                    positions[index : index + BATCH_SIZE],
+                    blue_to_play[index : index + BATCH_SIZE],
+                    with_mobility,
+                )
+                for index in range(0, len(positions), BATCH_SIZE)
+            ]
+        )
+
+    own = np.where(blue_to_play, positions[:, 0], positions[:, 1])
+    weight = 1 - np.minimum(1, popcount(own) / 12)
+
+    score = (material(positions) * 2 - center_distance(positions) * 0.5) * weight
+
+    if with_mobility:
+        score += mobility(positions)
+
+    return np.where(blue_to_play, score, -score)
+
+
+def child_positions(board, all_moves) -> tuple[np.ndarray, np.ndarray]:
+    """The masks of the positions after each move, without playing them
+
+    Args:
+        board (Board): the board
+        all_moves (Iterable[int]): the move codes
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: the (N, 3) masks & if blue is to play
+    """
+    is_blue = board.current_side == PieceTypes.BLUE
+    own, opponents = (board.blue, board.red) if is_blue else (board.red, board.blue)
+    children = []
+
+    for move in all_moves:
+        start = 1 << SQUARE_TO_BIT[move & 63]  # type: ignore
+        end = 1 << SQUARE_TO_BIT[move >> END_SHIFT & 63]  # type: ignore
+        captures = move >> CAPTURES_SHIFT
+
+        kings = board.kings & ~start & ~captures
+        if board.kings & start or move & KING_FLAG:
+            kings |= end
+
+        new_own, new_opponents = own & ~start | end, opponents & ~captures
+        children.append(
+            (new_own, new_opponents, kings)
+            if is_blue
+            else (new_opponents, new_own, kings)
+        )
+
+    positions = np.array(children, np.int64).reshape(-1, 3)
+    return positions, np.full(len(positions), not is_blue)
@@ -1,19 +1,53 @@
+import sys
 import time
-import threading
 from typing import Optional
 
 from .board import Board, PieceTypes
 from .move import Move, generate_moves
-from .ai import search_best_move
-
-TIME_LIMIT_FOR_SEARCH = 6
+from .ai import OPENING_BOOK, SearchEngine
+from .engine_worker import EngineWorker
+from .ponder import Ponderer
+from .stats import SearchStats
+from .time_manager import TimeManager
+
+# the ai plays on a clock & the time of every move comes from the
+# time left on it & the increment (see time_manager.py), without a
+# player the games are faster so they are fun to watch
+CLOCK_TIME = 180
+CLOCK_INCREMENT = 2
+AI_VS_AI_CLOCK_TIME = 60
+AI_VS_AI_CLOCK_INCREMENT = 1
+
+# the number of processes the ai searches with (see parallel.py),
+# with 1 it searches in this process. LAZY_SMP_WORKERS of parallel.py
+# is the number of cores, the default of the parallel search
+SEARCH_WORKERS = 1
+
+# the ai searches the position after the guessed reply of the player
+# while they think (see ponder.py), there are no threads in the browser
+PONDER = sys.platform != "emscripten"
+
+# the ai searches in a worker process (see engine_worker.py) so the
+# game keeps running while it thinks, in the browser there are no
+# processes so it searches in the game loop. The parallel search has
+# its own processes & is always waited for
+ENGINE_PROCESS = sys.platform != "emscripten"
+
+# without a player the moves of the ai are played at least this far apart
+AI_VS_AI_MOVE_DELAY = 0.3
 
 
 class Game:
     """The Game class for a checkers game
     this also contains the ai game play"""
 
-    def __init__(self, blue, red, board: None | list = None):
+    def __init__(
+        self,
+        blue,
+        red,
+        board: None | list = None,
+        search_engine: SearchEngine | None = None,
+    ):
         self.board = Board(board)
         self.moves: list[Move] = []
 
@@ -28,39 +62,174 @@ class Game:
 
         self.ai_time = 0
         self.start_time = 0
-        self.depth_searched = 0
-        self.positions_evaluated = 0
 
-        self.process: list[threading.Thread] = []
+        # the statistics of the last search of the ai (see stats.py)
+        self.stats = SearchStats()
+
+        self.clocks: dict[PieceTypes, TimeManager] = {}
+        self.reset_clocks()
+
+        # the engine the ai searches with in this process, a server
+        # with many games can give every game one from a pool. It is
+        # only made when the game searches in this process, not when
+        # the engine worker does all the searches
+        self.__search_engine = search_engine
+        self.__ponderer: Ponderer | None = None
+
+        self.parallel_search = None
+
+        self.engine: EngineWorker | None = None
+        self.pending_request: int | None = None
+        self.search_start_time = 0
+
+        # a book move waits for poll_comp_play like the result of the
+        # worker, so a frame is drawn (& the delay kept) before it
+        self.pending_book_move: int | None = None
+
+    @property
+    def search_engine(self) -> SearchEngine:
+        """The engine of the searches in this process, made
+        when it is first needed"""
+        if self.__search_engine is None:
+            self.__search_engine = SearchEngine()
+        return self.__search_engine
+
+    @property
+    def ponderer(self) -> Ponderer:
+        """The ponderer of the searches in this process, made
+        when it is first needed"""
+        if self.__ponderer is None:
+            self.__ponderer = Ponderer(self.search_engine)
+        return self.__ponderer
+
+    @property
+    def uses_engine_process(self) -> bool:
+        """Whether the ai searches in the engine worker process"""
+        return ENGINE_PROCESS and SEARCH_WORKERS == 1
 
     def make_comp_play(self):
         """Makes the computer play and
         stores the return from the computer.
-        This is important for the multithreading
-        need in this function
+        The search runs in the game loop so it
+        waits for the move
         """
         self.start_time = time.monotonic()
         self.comp_is_playing = True
 
         if not self.player_is_there:
-            time.sleep(0.3)
+            time.sleep(AI_VS_AI_MOVE_DELAY)
+
+        clock = self.clocks[self.board.current_side]
+        soft_limit, time_limit_for_play = clock.limits(self.board, len(self.moves))
+        self.search_start_time = time.monotonic()
+
+        pondered = None
+        if len(self.moves) > 1:
+            pondered = self.ponderer.finish(self.board, time_limit_for_play, soft_limit)
+        else:
+            self.ponderer.stop()
+
+        book_move = OPENING_BOOK.choose(self.board) if pondered is None else None
+
+        if pondered is not None:
+            best_move, stats = pondered
+            move = Move.from_code(best_move)
 
-        time_limit_for_play = TIME_LIMIT_FOR_SEARCH if self.player_is_there else 2
-        move, positions_checked, max_depth_searched = search_best_move(
-            self.board, time_limit_for_play
+        elif book_move is not None:
+            move = Move.from_code(book_move)
+            stats = SearchStats("book")
+
+        elif SEARCH_WORKERS > 1:
+            if self.parallel_search is None:
+                from .parallel import LazySMP  # pylint: disable=import-outside-toplevel
+
+                self.parallel_search = LazySMP(SEARCH_WORKERS)
+
+            move, stats = self.parallel_search.search(
+                self.board, time_limit_for_play, soft_limit
+            )
+        else:
+            move, stats = self.search_engine.search_best_move(
+                self.board, time_limit_for_play, soft_limit
+            )
+
+        self.__play_comp_move(move, stats)
+
+    def start_comp_play(self):
+        """Asks the engine worker for the move of the
+        computer without waiting for it, poll_comp_play
+        plays it once it is found
+        """
+        self.start_time = time.monotonic()
+        self.comp_is_playing = True
+
+        if self.engine is None:
+            self.engine = EngineWorker()
+
+        clock = self.clocks[self.board.current_side]
+        soft_limit, time_limit_for_play = clock.limits(self.board, len(self.moves))
+        self.search_start_time = time.monotonic()
+
+        book_move = OPENING_BOOK.choose(self.board)
+        if book_move is not None:
+            self.pending_book_move = book_move
+            return
+
+        self.pending_request = self.engine.search(
+            self.board, time_limit_for_play, soft_limit
         )
+
+    def poll_comp_play(self):
+        """Plays the move of the engine worker or the book
+        move if it is ready, the game loop calls this every frame
+        """
+        if self.pending_book_move is None and (
+            self.pending_request is None or self.engine is None
+        ):
+            return
+
+        if (
+            not self.player_is_there
+            and time.monotonic() - self.start_time < AI_VS_AI_MOVE_DELAY
+        ):
+            return
+
+        if self.pending_book_move is not None:
+            book_move, self.pending_book_move = self.pending_book_move, None
+            self.__play_comp_move(Move.from_code(book_move), SearchStats("book"))
+            return
+
+        result = self.engine.result(self.pending_request)  # type: ignore
+        if result is None:
+            return
+
+        self.pending_request = None
+        best_move, stats = result
+        self.__play_comp_move(Move.from_code(best_move), stats)
+
+    def __play_comp_move(self, move: Move, stats: SearchStats):
+        """Plays the move of the computer, starts pondering
+        & lets the game go on"""
+        self.clocks[self.board.current_side].update(
+            time.monotonic() - self.search_start_time
+        )
+
         move.play(self.board)
         self.reset_correct_moves()
         self.board.update_state()
 
+        if PONDER and self.player_is_there and SEARCH_WORKERS == 1:
+            if self.uses_engine_process and self.engine is not None:
+                self.engine.ponder(self.board)
+            else:
+                self.ponderer.start(self.board)
+
+        self.stats = stats
+        self.ai_time = time.monotonic() - self.start_time
+
         self.comp_is_playing = False
         self.update_game()
 
-        time_taken = time.monotonic() - self.start_time
-        self.depth_searched = max_depth_searched
-        self.positions_evaluated = positions_checked
-        self.ai_time = time_taken
-
     def update_game(self, move: Optional[Move] = None):
         """Play a move on the Board & updates
         the game state accordingly
@@ -79,14 +248,22 @@ class Game:
             and self.board.is_playing
             and not self.comp_is_playing
         ):
-            if 0:
-                comp = threading.Thread(target=self.make_comp_play)
-                comp.daemon = True
-                self.process.append(comp)
-                comp.start()
+            if self.uses_engine_process:
+                self.start_comp_play()
             else:
                 self.make_comp_play()
 
+    def reset_clocks(self):
+        """Sets the clocks of both sides back to the start"""
+        clock_time, increment = CLOCK_TIME, CLOCK_INCREMENT
+        if not self.player_is_there:
+            clock_time, increment = AI_VS_AI_CLOCK_TIME, AI_VS_AI_CLOCK_INCREMENT
+
+        self.clocks = {
+            side: TimeManager(clock_time, increment)
+            for side in (PieceTypes.BLUE, PieceTypes.RED)
+        }
+
     def find_move(self, start: int, end: int) -> Move:
         """Find the index for the  move based on the start and end
         this is possible only because all the moves are unique
@@ -113,30 +290,24 @@ class Game:
         """
         self.moves = generate_moves(self.board)
 
-    def __stop_all_process(self):
-        self.comp_is_playing = False
-        for process in self.process:
-            process.join()
-
-        self.process.clear()
-        self.board.reset()
-        self.moves.clear()
-        self.reset_correct_moves()
-        self.update_game()
-
     def reset_game(self, blue, red):
         """Resets the Game to the original state
-        and sets it up for the new game
+        and sets it up for the new game, the search
+        of the ai is cancelled
 
         Args:
             blue (_type_): is blue being played
             red (_type_): is red being played
         """
-        self.board.clear()
+        if self.engine is not None:
+            self.engine.cancel()
 
-        reset_process_thread = threading.Thread(target=self.__stop_all_process)
-        reset_process_thread.daemon = True
-        reset_process_thread.start()
+        self.pending_request = None
+        self.pending_book_move = None
+        self.comp_is_playing = False
+
+        if self.__ponderer is not None:
+            self.__ponderer.stop()
 
         self.should_inverse_board = blue is None and red is not None
         self.player_is_there = blue is not None or red is not None
@@ -146,8 +317,27 @@ class Game:
 
         self.ai_time = 0
         self.start_time = 0
-        self.depth_searched = 0
-        self.positions_evaluated = 0
+        self.stats = SearchStats()
+
+        self.reset_clocks()
+
+        self.board.clear()
+        self.board.reset()
+        self.reset_correct_moves()
+        self.update_game()
+
+    def close(self):
+        """Stops the engine worker & the parallel search"""
+        if self.__ponderer is not None:
+            self.__ponderer.stop()
+
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
+
+        if self.parallel_search is not None:
+            self.parallel_search.close()
+            self.parallel_search = None
 
     @property
     def is_players_turn(self) -> bool:
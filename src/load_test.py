@@ -0,0 +1,266 @@
+"""Contains the load test of the game server (see server.py): many
+simulated clients play against the engine at the same time over HTTP.
+
+Every client plays its games as blue with random legal moves & asks
+for the move of the engine after each of them. The latency of every
+engine move is measured from the request to the answer, so it holds
+the time waiting for a worker as well as the search.
+
+    python -m src.load_test --clients 16 --games 2 --time 0.05
+    python -m src.load_test --serve --workers 2
+
+With --serve the server is started on the port & stopped at the end.
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import statistics
+import subprocess
+import http.client
+
+# the address server.py listens on by default, server.py is not
+# imported so the clients do not load quart, hypercorn & the ai
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+
+LOAD_TEST_CLIENTS = 8
+LOAD_TEST_GAMES = 2
+LOAD_TEST_TIME = 0.05
+
+# a game without a result after this many plies is stopped
+MAX_PLIES = 200
+
+# a refused engine move (the queue is full) is asked again after this long
+RETRY_DELAY = 0.05
+
+
+class Client:
+    """One simulated player with its own connection to the server"""
+
+    def __init__(self, host: str, port: int, seed: int):
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.random = random.Random(seed)
+
+    def request(self, method: str, path: str, body: dict | None = None):
+        """Sends a request & reads the JSON answer
+
+        Args:
+            method (str): the HTTP method
+            path (str): the path
+            body (dict | None, optional): the JSON body. Defaults to None.
+
+        Returns:
+            tuple[int, dict]: the status & the answer
+        """
+        data = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if data else {}
+
+        self.connection.request(method, path, data, headers)
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+
+    def play_game(self, time_limit: float, results: dict):
+        """Plays one game against the engine
+
+        Args:
+            time_limit (float): the time budget of every engine move
+            results (dict): the latencies, games & errors of all clients
+        """
+        status, state = self.request("POST", "/games")
+        if status != 201:
+            results["errors"].append(state.get("error", status))
+            return
+
+        game = f"/games/{state['id']}"
+        plies = 0
+
+        while state["is_playing"] and plies < MAX_PLIES:
+            if state["side"] == "blue":
+                _, moves = self.request("GET", game + "/moves")
+                move = self.random.choice(moves["moves"])
+                status, answer = self.request(
+                    "POST",
+                    game + "/moves",
+                    {"start": move["start"], "end": move["end"]},
+                )
+            else:
+                start_time = time.perf_counter()
+                status, answer = self.request(
+                    "POST", game + "/engine-move", {"time": time_limit}
+                )
+
+                if status == 503:
+                    results["refused"] += 1
+                    time.sleep(RETRY_DELAY)
+                    continue
+
+                results["latencies"].append(time.perf_counter() - start_time)
+
+            if status != 200:
+                # a game that failed is not counted as played
+                results["errors"].append(answer.get("error", status))
+                self.request("DELETE", game)
+                return
+
+            state = answer["state"]
+            plies += 1
+
+        self.request("DELETE", game)
+        results["games"] += 1
+
+    def close(self):
+        self.connection.close()
+
+
+def run_load_test(
+    host: str, port: int, clients: int, games: int, time_limit: float
+) -> dict:
+    """Lets the clients play their games at the same time
+
+    Args:
+        host (str): the host of the server
+        port (int): the port of the server
+        clients (int): the number of clients
+        games (int): the games every client plays
+        time_limit (float): the time budget of every engine move
+
+    Returns:
+        dict: the games per second, the engine move latencies & the errors
+    """
+    results = {"latencies": [], "games": 0, "refused": 0, "errors": []}
+    lock = threading.Lock()
+
+    def play(index: int):
+        client = Client(host, port, index)
+        own_results = {"latencies": [], "games": 0, "refused": 0, "errors": []}
+
+        try:
+            for _ in range(games):
+                client.play_game(time_limit, own_results)
+        except (OSError, http.client.HTTPException, ValueError) as error:
+            own_results["errors"].append(str(error))
+        finally:
+            client.close()
+
+        with lock:
+            for key, value in own_results.items():
+                results[key] += value
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=play, args=(index,)) for index in range(clients)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - start_time
+    latencies = sorted(results["latencies"])
+
+    return {
+        "clients": clients,
+        "games": results["games"],
+        "time": elapsed,
+        "games_per_second": results["games"] / elapsed,
+        "engine_moves": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "refused": results["refused"],
+        "errors": results["errors"],
+    }
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """The value below which the given percent of the sorted values are"""
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+
+    return statistics.quantiles(values, n=100, method="inclusive")[int(percent) - 1]
+
+
+def wait_for_server(host: str, port: int, timeout: float = 30):
+    """Waits until the server answers
+
+    Raises:
+        TimeoutError: when it does not answer in time
+    """
+    end_time = time.monotonic() + timeout
+
+    while time.monotonic() < end_time:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request("GET", "/games/none")
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+
+    raise TimeoutError(f"the server on {host}:{port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the game server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--clients", type=int, default=LOAD_TEST_CLIENTS)
+    parser.add_argument("--games", type=int, default=LOAD_TEST_GAMES)
+    parser.add_argument("--time", type=float, default=LOAD_TEST_TIME)
+    parser.add_argument(
+        "--serve", action="store_true", help="start the server for the test"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="the search processes of the started server"
+    )
+    args = parser.parse_args()
+
+    server = None
+    if args.serve:
+        command = [
+            sys.executable,
+            "-m",
+            "src.server",
+            "--host",
+            args.host,
+            "--port",
+            str(args.port),
+        ]
+
+        # without --workers the server picks its own number
+        if args.workers is not None:
+            command += ["--workers", str(args.workers)]
+
+        server = subprocess.Popen(command)
+
+    try:
+        wait_for_server(args.host, args.port)
+        summary = run_load_test(
+            args.host, args.port, args.clients, args.games, args.time
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(
+        f"{summary['clients']} clients  {summary['games']} games in "
+        f"{summary['time']:.1f}s  {summary['games_per_second']:.2f} games/s"
+    )
+    print(
+        f"{summary['engine_moves']} engine moves  "
+        f"p50 {summary['p50'] * 1000:.0f}ms  p99 {summary['p99'] * 1000:.0f}ms  "
+        f"refused {summary['refused']}  errors {len(summary['errors'])}"
+    )
+
+    for error in sorted(set(map(str, summary["errors"]))):
+        print("error:", error)
+
+
+if __name__ == "__main__":
+    main()
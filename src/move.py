@@ -1,193 +1,566 @@
-# pylint: disable=dangerous-default-value
-from settings import DIRECTIONAL_OFFSET, NUM_SQUARES_TO_EDGE
+"""Contains the Move class & the move generation.
+
+Inside the search a move is a single int (a move code):
+    bits 0 - 5   the start index
+    bits 6 - 11  the end index
+    bit 12       set if the move makes a king
+    bits 13 -    the mask of the captured pieces (see bitboard.py)
+the Move class wraps a move code for the game & the ui.
+"""
+
+import threading
+from collections import OrderedDict
+
+from .bitboard import (
+    BIT_TO_SQUARE,
+    BLUE_KING_ROW,
+    EVEN_ROWS,
+    FULL_MASK,
+    JUMP_SHIFTS,
+    KING_DIRECTIONS,
+    ODD_ROWS,
+    RED_DIRECTIONS,
+    RED_KING_ROW,
+    BLUE_DIRECTIONS,
+    SQUARE_TO_BIT,
+    STEP_MASKS,
+    STEP_SHIFTS,
+    iterate_bits,
+    shift,
+    step,
+)
 from .utils import PieceTypes
 
+END_SHIFT = 6
+KING_FLAG = 1 << 12
+CAPTURES_SHIFT = 13
+
+# a man reaching either edge is made a king
+KING_ROWS = BLUE_KING_ROW | RED_KING_ROW
+
+
+def encode_move(start: int, end: int, captures: int = 0, make_king=False) -> int:
+    """Packs a move into a move code
+
+    Args:
+        start (int): the start index
+        end (int): the end index
+        captures (int, optional): the mask of captured pieces. Defaults to 0.
+        make_king (bool, optional): if the move makes a king. Defaults to False.
+
+    Returns:
+        int: the move code
+    """
+    code = start | end << END_SHIFT | captures << CAPTURES_SHIFT
+    return code | KING_FLAG if make_king else code
+
+
+def play_move(board, code: int):
+    """Plays a move code on the Board
+
+    Args:
+        board (Board): the board to update
+        code (int): the move code
+    """
+    end = code >> END_SHIFT & 63
+    board.move(code & 63, end)
+
+    for bit in iterate_bits(code >> CAPTURES_SHIFT):
+        board.kill_piece(BIT_TO_SQUARE[bit])
+
+    if code & KING_FLAG:
+        board.make_king(end)
+
+
+def move_name(move: int) -> str:
+    """The name of a move code, eg c6-d5 or c6xe4"""
+
+    def square(index: int) -> str:
+        return chr(ord("a") + index % 8) + str(index // 8 + 1)
+
+    separator = "x" if move >> CAPTURES_SHIFT else "-"
+    return square(move & 63) + separator + square(move >> END_SHIFT & 63)
+
 
 class Move:
     """This contains data for any and all moves
     and also can play the move on the board
     """
 
-    def __init__(
-        self,
-        piece: int,
-        start: int,
-        end: int,
-        kill: list[int] = [],
-        move_through: list[int] = [],
-    ):
+    __slots__ = ("start", "end", "captures", "make_king", "__move_through")
+
+    def __init__(self, start: int, end: int, captures: int = 0, make_king=False):
         self.start = start
         self.end = end
-        self.kills = kill
-        self.move_through = move_through
+        self.captures = captures
+        self.make_king = make_king
+        self.__move_through: list[int] | None = None
 
-        self.is_killing_move = len(kill) > 0
-        self.make_king = False
+    @classmethod
+    def from_code(cls, code: int) -> "Move":
+        """Creates a Move from a move code
 
-        if abs(piece) % 2 != 0 and end // 8 in [0, 7]:
-            self.make_king = True
+        Args:
+            code (int): the move code
+
+        Returns:
+            Move: the move
+        """
+        return cls(
+            code & 63,
+            code >> END_SHIFT & 63,
+            code >> CAPTURES_SHIFT,
+            code & KING_FLAG != 0,
+        )
+
+    @property
+    def code(self) -> int:
+        """The move code of the move"""
+        return encode_move(self.start, self.end, self.captures, self.make_king)
+
+    @property
+    def kills(self) -> list[int]:
+        """The index of the pieces killed by the move"""
+        return [BIT_TO_SQUARE[bit] for bit in iterate_bits(self.captures)]
+
+    @property
+    def is_killing_move(self) -> bool:
+        """Whether the move kills any piece"""
+        return self.captures != 0
+
+    @property
+    def move_through(self) -> list[int]:
+        """The index of the squares the piece lands on between
+        the start & the end of a multi kill. It is only worked
+        out when it is asked for (by the ui)"""
+        if self.__move_through is None:
+            start = 1 << SQUARE_TO_BIT[self.start]  # type: ignore
+            end = 1 << SQUARE_TO_BIT[self.end]  # type: ignore
+            path = find_path(start, end, self.captures) or []
+            self.__move_through = [
+                BIT_TO_SQUARE[position.bit_length() - 1] for position in path
+            ]
+
+        return self.__move_through
 
     def play(self, board):
         """Plays a move on the Board
         Args:
             board (Board): the board to update
         """
-        board.move(self.start, self.end)
+        play_move(board, self.code)
 
-        for index in self.kills:
-            board.kill_piece(index)
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Move) and self.code == other.code
 
-        if self.make_king:
-            board.make_king(self.end)
+    def __hash__(self) -> int:
+        return self.code
 
     def __str__(self):
         return f"{self.start} -> {self.end} | making king - {self.make_king}"
 
 
-def generate_sliding_moves(piece: int, start: int, board: list) -> list[Move]:
-    """Generate all the sliding moves for a piece
+def find_path(position: int, end: int, captures: int) -> list[int] | None:
+    """Finds the squares a piece lands on while jumping over
+    all the captured pieces from position to end
+
+    Args:
+        position (int): the mask of the start square
+        end (int): the mask of the end square
+        captures (int): the mask of the pieces still to capture
+
+    Returns:
+        list[int] | None: the masks of the squares in between or None
+    """
+    if not captures:
+        return [] if position == end else None
+
+    for kill_piece, landing, _ in JUMP_TABLE[KING][position.bit_length() - 1]:
+        if not kill_piece & captures:
+            continue
+
+        path = find_path(landing, end, captures ^ kill_piece)
+        if path is not None:
+            return [] if landing == end and not path else [landing] + path
+
+    return None
+
+
+# the kinds of pieces, which each move in their own directions
+RED_MAN = 0
+BLUE_MAN = 1
+KING = 2
+
+PIECE_KINDS = {-1: RED_MAN, 1: BLUE_MAN, -2: KING, 2: KING}
+
+
+def _build_tables(directions: tuple[int, ...], can_promote: bool):
+    """Builds the sliding & jumping tables of a kind of piece.
+
+    For every square the sliding table has (target mask, end code)
+    pairs and the jumping table has (jumped mask, landing mask,
+    landing square) triples, where the end code is the part of the
+    move code for the end of the move (including the king flag)
+
+    Args:
+        directions (tuple[int, ...]): the directions the piece moves in
+        can_promote (bool): if the piece is made a king on the edges
+
+    Returns:
+        tuple: the sliding table, the jumping table & the end codes
+    """
+    end_codes = []
+    for bit, square in enumerate(BIT_TO_SQUARE):
+        promotes = can_promote and KING_ROWS >> bit & 1
+        end_codes.append(encode_move(0, square, 0, promotes))
+
+    slides, jumps = [], []
+    for bit in range(32):
+        position = 1 << bit
+        square_slides, square_jumps = [], []
+
+        for direction in directions:
+            target = step(position, direction)
+            landing = step(target, direction)
+
+            if target:
+                target_bit = target.bit_length() - 1
+                square_slides.append((target, end_codes[target_bit]))
+
+            if landing:
+                square_jumps.append((target, landing, landing.bit_length() - 1))
+
+        slides.append(tuple(square_slides))
+        jumps.append(tuple(square_jumps))
+
+    return tuple(slides), tuple(jumps), tuple(end_codes)
+
+
+# the tables of every kind of piece, indexed by [kind][bit]
+SLIDE_TABLE, JUMP_TABLE, END_CODES = zip(
+    _build_tables(RED_DIRECTIONS, True),
+    _build_tables(BLUE_DIRECTIONS, True),
+    _build_tables(KING_DIRECTIONS, False),
+)
+
+
+def sliding_move_codes(piece: int, start: int, board, moves: list[int]):
+    """Adds the codes of all the sliding moves of a piece to moves
 
     Args:
         piece (int): the piece
         start (int): the start position
-        board (list): the board where the piece is present
+        board (Board): the board where the piece is present
+        moves (list[int]): the list to add the move codes to
+    """
+    occupied = board.blue | board.red
 
-    Returns:
-        list[Move]: the number of moves possible by the piece
+    for target, end_code in SLIDE_TABLE[PIECE_KINDS[piece]][SQUARE_TO_BIT[start]]:
+        if not target & occupied:
+            moves.append(start | end_code)
+
+
+def attacking_move_codes(piece: int, start: int, board, moves: list[int]):
+    """Adds the codes of all the attacking moves of a piece to moves.
+
+    The jump chains are followed depth first & only the complete
+    chains (where the piece cannot kill any more) are added. A chain
+    never jumps a piece it already killed and chains that reach the
+    same square with the same kills are only followed once
+
+    Args:
+        piece (int): the piece
+        start (int): the start position
+        board (Board): the board where the piece is present
+        moves (list[int]): the list to add the move codes to
     """
-    is_king = piece % 2 == 0
-    move = []
+    opponents = board.red if piece > 0 else board.blue
+    occupied = board.blue | board.red
 
-    start_direction_index = 0
-    end_direction_index = 4
+    kind = PIECE_KINDS[piece]
+    jump_table, end_codes = JUMP_TABLE[kind], END_CODES[kind]
 
-    if is_king:
-        end_direction_index = 4
-    elif piece < 0:
-        end_direction_index = 2
-    else:
-        start_direction_index = 2
+    # current position & the killed pieces
+    attack_positions = [(SQUARE_TO_BIT[start], 0)]
+    visited = set()
 
-    for offset in range(start_direction_index, end_direction_index):
-        if NUM_SQUARES_TO_EDGE[start][offset] > 0:
-            target_square = start + DIRECTIONAL_OFFSET[offset]
-            target_contains_piece = board[target_square] != 0
+    while attack_positions:
+        position, captures = attack_positions.pop()
+        is_complete = True
 
-            if target_contains_piece:
-                continue
+        for kill_piece, landing, landing_bit in jump_table[position]:
+            if kill_piece & opponents and not kill_piece & captures:
+                if landing & occupied:
+                    continue
 
-            new_move = Move(piece, start, target_square)
-            move.append(new_move)
+                is_complete = False
+                chain = (landing_bit, captures | kill_piece)
 
-    return move
+                if chain not in visited:
+                    visited.add(chain)
+                    attack_positions.append(chain)
 
+        if is_complete and captures:
+            moves.append(start | end_codes[position] | captures << CAPTURES_SHIFT)
 
-def generate_attacking_moves(piece: int, start: int, board: list) -> list[Move]:
+
+def generate_sliding_moves(piece: int, start: int, board) -> list[Move]:
     """Generate all the sliding moves for a piece
 
     Args:
         piece (int): the piece
         start (int): the start position
-        board (list): the board where the piece is present
+        board (Board): the board where the piece is present
+
+    Returns:
+        list[Move]: the number of moves possible by the piece
+    """
+    codes = []
+    sliding_move_codes(piece, start, board, codes)
+    return [Move.from_code(code) for code in codes]
+
+
+def generate_attacking_moves(piece: int, start: int, board) -> list[Move]:
+    """Generate all the attacking moves for a piece
+
+    Args:
+        piece (int): the piece
+        start (int): the start position
+        board (Board): the board where the piece is present
 
     Returns:
         list[Move]: the number of moves possible by the piece
     """
-    is_king = piece % 2 == 0
-    move = []
+    codes = []
+    attacking_move_codes(piece, start, board, codes)
+    return [Move.from_code(code) for code in codes]
 
-    opposite_piece = (
-        PieceTypes.RED if piece in PieceTypes.BLUE.value else PieceTypes.BLUE
-    )
 
-    start_direction_index = 0
-    end_direction_index = 4
+def side_masks(board) -> tuple[int, int, int, tuple[int, ...]]:
+    """Gets the masks needed to generate the moves of
+    the side to play
 
-    if is_king:
-        end_direction_index = 4
-    elif piece < 0:
-        end_direction_index = 2
+    Args:
+        board (Board): The board
+
+    Returns:
+        tuple: men, kings, opponents & the directions the men move in
+    """
+    if board.current_side == PieceTypes.BLUE:
+        own, opponents, directions = board.blue, board.red, BLUE_DIRECTIONS
     else:
-        start_direction_index = 2
+        own, opponents, directions = board.red, board.blue, RED_DIRECTIONS
 
-    offsets = range(start_direction_index, end_direction_index)
-    attack_positions = []  # current position, kill position, moved through position
+    return own & ~board.kings, own & board.kings, opponents, directions
 
-    for offset in offsets:
-        if NUM_SQUARES_TO_EDGE[start][offset] >= 2:
-            kill_piece = start + DIRECTIONAL_OFFSET[offset]
-            final_index = start + DIRECTIONAL_OFFSET[offset] * 2
 
-            if board[kill_piece] in opposite_piece.value and board[final_index] == 0:
-                attack_positions.append((final_index, [kill_piece], []))
+def find_jumpers(board) -> int:
+    """Finds all the pieces of the side to play
+    that can make a kill
 
-    while len(attack_positions) > 0:
-        attack = attack_positions.pop(0)
-        move.append(Move(piece, start, attack[0], attack[1], attack[2]))
+    Args:
+        board (Board): The board
 
-        for offset in offsets:
-            if NUM_SQUARES_TO_EDGE[attack[0]][offset] >= 2:
-                kill_piece = attack[0] + DIRECTIONAL_OFFSET[offset]
-                final_index = attack[0] + DIRECTIONAL_OFFSET[offset] * 2
+    Returns:
+        int: the mask of pieces that can make a kill
+    """
+    men, kings, opponents, men_directions = side_masks(board)
+    empty = ~(board.blue | board.red) & FULL_MASK
+    jumpers = 0
 
-                if (
-                    board[kill_piece] in opposite_piece.value
-                    and board[final_index] == 0
-                ):
-                    if attack[1][-1] != kill_piece:
-                        attack_positions.append(
-                            (
-                                final_index,
-                                attack[1] + [kill_piece],
-                                attack[2] + [attack[0]],
-                            )
-                        )
+    for direction in KING_DIRECTIONS:
+        movers = kings | men if direction in men_directions else kings
+        landing = step(step(movers, direction) & opponents, direction) & empty
+        jumpers |= shift(landing, -JUMP_SHIFTS[direction])
 
-    return move
+    return jumpers
 
 
-def generate_moves(board) -> list[Move]:
-    """Generate all the possible moves for
-    all the pieces on the board
-    and returns a list of moves
+def bulk_sliding_move_codes(board, moves: list[int]):
+    """Adds the codes of all the sliding moves for the side
+    to play to moves by shifting all the pieces at once
+
+    Args:
+        board (Board): The board
+        moves (list[int]): the list to add the move codes to
+    """
+    men, kings, _, men_directions = side_masks(board)
+    empty = ~(board.blue | board.red) & FULL_MASK
+
+    for direction in KING_DIRECTIONS:
+        movers = kings | men if direction in men_directions else kings
+        movers &= STEP_MASKS[direction]
+
+        for rows, amount in zip((EVEN_ROWS, ODD_ROWS), STEP_SHIFTS[direction]):
+            targets = shift(movers & rows, amount) & empty
+
+            for end_bit in iterate_bits(targets):
+                start_bit = end_bit - amount
+                make_king = KING_ROWS >> end_bit & 1 and not kings >> start_bit & 1
+                moves.append(
+                    encode_move(
+                        BIT_TO_SQUARE[start_bit], BIT_TO_SQUARE[end_bit], 0, make_king
+                    )
+                )
+
+
+def can_move(board) -> bool:
+    """Checks whether the side to play has any move at all
 
     Args:
         board (Board): The board
 
     Returns:
-        list[Move]: the moves
+        bool: whether there is any move
     """
+    men, kings, _, men_directions = side_masks(board)
+    empty = ~(board.blue | board.red) & FULL_MASK
+
+    for direction in KING_DIRECTIONS:
+        movers = kings | men if direction in men_directions else kings
+        if step(movers, direction) & empty:
+            return True
+
+    return find_jumpers(board) != 0
 
-    attacking_moves = []
-    max_kills = -100
 
-    sliding_moves = []
+def generate_move_codes(board, moves: list[int]) -> list[int]:
+    """Generate the codes of all the possible moves for
+    the side to play. The given list is cleared & filled
+    so the search can reuse the same list for every position
+
+    Args:
+        board (Board): The board
+        moves (list[int]): the list to fill
 
-    pieces = board.all_pieces
-    board_list = board.board  # type: ignore
+    Returns:
+        list[int]: the filled list
+    """
+    moves.clear()
+    jumpers = find_jumpers(board)
 
-    for (piece, start) in pieces:
-        if piece in board.current_side.value:
+    if not jumpers:
+        bulk_sliding_move_codes(board, moves)
+        return moves
 
-            piece_attack_moves = generate_attacking_moves(piece, start, board_list)
+    for bit in iterate_bits(jumpers):
+        start = BIT_TO_SQUARE[bit]
+        attacking_move_codes(board.piece(start), start, board, moves)
 
-            for move in piece_attack_moves:
-                if len(move.kills) > max_kills:
-                    attacking_moves = [move]
-                    max_kills = len(move.kills)
+    # a side has to make the move that kills the most pieces
+    max_kills = max((code >> CAPTURES_SHIFT).bit_count() for code in moves)
+    moves[:] = [
+        code for code in moves if (code >> CAPTURES_SHIFT).bit_count() == max_kills
+    ]
 
-                elif len(move.kills) == max_kills:
-                    attacking_moves.append(move)
+    return moves
 
-                else:
-                    continue
 
-            if len(attacking_moves) <= 0:
-                sliding_moves = sliding_moves + generate_sliding_moves(
-                    piece, start, board_list
-                )
+class MoveCache:
+    """A bounded cache of the legal moves of positions keyed by
+    the Zobrist key of the board. When it is full the least
+    recently used position is dropped.
+
+    The moves are stored as a tuple of move codes so that
+    the same moves can be shared by everyone asking for them.
+    A lock guards the positions so threads (like the ponder thread
+    & the game) can use the same cache, the moves are generated
+    outside of it
+    """
+
+    def __init__(self, size: int = 1 << 15):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.__moves: OrderedDict[int, tuple[int, ...]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__moves)
+
+    def moves(self, board) -> tuple[int, ...]:
+        """Gets the legal moves of the side to play,
+        generating them if the position is not cached
+
+        Args:
+            board (Board): The board
+
+        Returns:
+            tuple[int, ...]: the move codes
+        """
+        key = board.key
 
-    if len(attacking_moves) <= 0:
-        return sliding_moves
+        with self.__lock:
+            moves = self.__moves.get(key)
 
-    return attacking_moves
+            if moves is not None:
+                self.hits += 1
+                self.__moves.move_to_end(key)
+                return moves
+
+            self.misses += 1
+
+        moves = tuple(generate_move_codes(board, []))
+
+        with self.__lock:
+            self.__moves[key] = moves
+
+            if len(self.__moves) > self.size:
+                self.__moves.popitem(last=False)
+
+        return moves
+
+    def clear(self):
+        """Removes all the positions & resets the counters"""
+        with self.__lock:
+            self.__moves.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# shared by the game, the board state checks & the search
+MOVE_CACHE = MoveCache()
+
+
+def legal_moves(board) -> tuple[int, ...]:
+    """Gets the codes of all the legal moves for the side
+    to play from the shared move cache
+
+    Args:
+        board (Board): The board
+
+    Returns:
+        tuple[int, ...]: the move codes
+    """
+    return MOVE_CACHE.moves(board)
+
+
+def capture_moves(board) -> tuple[int, ...]:
+    """Gets the codes of the captures for the side to play.
+    When there is no capture the quiet moves are not generated
+
+    Args:
+        board (Board): The board
+
+    Returns:
+        tuple[int, ...]: the move codes, empty if there is no capture
+    """
+    if not find_jumpers(board):
+        return ()
+
+    # killing is forced so all the legal moves are captures
+    return MOVE_CACHE.moves(board)
+
+
+def generate_moves(board) -> list[Move]:
+    """Generate all the possible moves for
+    all the pieces on the board
+    and returns a list of moves
+
+    Args:
+        board (Board): The board
+
+    Returns:
+        list[Move]: the moves
+    """
+    return [Move.from_code(code) for code in legal_moves(board)]
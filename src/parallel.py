@@ -0,0 +1,217 @@
+"""Contains the parallel (Lazy SMP) search.
+
+Every worker process runs the normal iterative deepening search
+on the same root position. They only talk to each other through
+a transposition table in shared memory, so what one worker finds
+makes the others faster. To keep them from all doing the same work
+half of the workers start one iteration deeper & every helper
+searches the root moves in its own order. The result of the worker
+that completed the deepest iteration is played.
+
+Run `python -m src.parallel` to see how the depth & the nodes per
+second scale with the number of workers.
+"""
+
+import os
+import random
+import argparse
+import multiprocessing
+
+from . import ai
+from .board import Board
+from .move import Move, legal_moves
+from .stats import SearchStats
+from .transposition import SharedTranspositionTable
+
+# the processes of a LazySMP search when no number is given, the game
+# uses its own SEARCH_WORKERS (see game.py)
+LAZY_SMP_WORKERS = os.cpu_count() or 1
+
+# the engine of a worker process, it searches with the shared table
+_ENGINE: ai.SearchEngine | None = None
+
+
+def _init_worker(table_name: str, size_mb: float):
+    """Makes the engine of a worker process with the shared table"""
+    global _ENGINE  # pylint: disable=global-statement
+    _ENGINE = ai.SearchEngine(
+        transposition_table=SharedTranspositionTable(size_mb, table_name)
+    )
+
+
+def _search_worker(
+    board: Board,
+    time_limit: float,
+    worker_index: int,
+    root_moves: list[int],
+    soft_limit: float | None = None,
+) -> SearchStats:
+    """Runs the search of a single worker
+
+    Args:
+        board (Board): the board to search
+        time_limit (float): the time limit for the search
+        worker_index (int): the index of the worker, 0 is the main worker
+        root_moves (list[int]): the moves to search
+        soft_limit (float | None, optional): the time the search should
+            take. Defaults to the time limit.
+
+    Returns:
+        SearchStats: the statistics of the search with its best move
+    """
+    if worker_index > 0:
+        random.Random(worker_index).shuffle(root_moves)
+
+    engine: ai.SearchEngine = _ENGINE  # type: ignore
+    engine.iterative_deepening(
+        board,
+        time_limit,
+        root_moves,
+        min_depth=1 + worker_index % 2,
+        soft_limit=soft_limit,
+    )
+    return engine.stats
+
+
+class LazySMP:
+    """A pool of worker processes sharing one transposition table.
+    The pool & the table are kept between searches so they are
+    only set up once per game
+    """
+
+    def __init__(
+        self,
+        workers: int = LAZY_SMP_WORKERS,
+        size_mb: float = ai.TRANSPOSITION_TABLE_SIZE_MB,
+    ):
+        self.workers = workers
+        self.table = SharedTranspositionTable(size_mb)
+
+        # the statistics of every worker in the last search
+        self.last_results: list[SearchStats] = []
+
+        self.__pool = multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(self.table.name, size_mb)
+        )
+
+    def search(
+        self, board: Board, wait_time: float, soft_limit: float | None = None
+    ) -> tuple[Move, SearchStats]:
+        """Searches the best move with all the workers
+
+        Args:
+            board (Board): the board to search the best move
+            wait_time (float): the wait time the ai can afford
+            soft_limit (float | None, optional): the time the search
+                should take. Defaults to the wait time.
+
+        Returns:
+            tuple[Move, SearchStats]: best move & the statistics of all
+                the workers together
+        """
+        all_moves = list(legal_moves(board))
+
+        if len(all_moves) == 1:  # killing move only
+            self.last_results = []
+            return Move.from_code(all_moves[0]), SearchStats("forced")
+
+        tablebase_move = ai.best_tablebase_move(board, all_moves)
+        if tablebase_move is not None:
+            self.last_results = []
+            stats = SearchStats("tablebase")
+            stats.nodes = len(all_moves)
+            return Move.from_code(tablebase_move), stats
+
+        searches = [
+            self.__pool.apply_async(
+                _search_worker,
+                (board, wait_time, index, all_moves.copy(), soft_limit),
+            )
+            for index in range(self.workers)
+        ]
+        self.last_results = [result.get() for result in searches]
+
+        # the deepest search wins & the main worker wins ties
+        deepest = max(self.last_results, key=lambda result: result.depth)
+
+        stats = SearchStats()
+        stats.best_move, stats.score = deepest.best_move, deepest.score
+        stats.depth, stats.iterations = deepest.depth, deepest.iterations
+        for result in self.last_results:
+            stats.merge(result)
+
+        return Move.from_code(deepest.best_move), stats  # type: ignore
+
+    @property
+    def nodes_per_second(self) -> float:
+        """The nodes searched per second by all the workers in the last search"""
+        if not self.last_results:
+            return 0.0
+
+        elapsed = max(result.time for result in self.last_results)
+        return sum(result.total_nodes for result in self.last_results) / elapsed
+
+    def close(self):
+        """Stops the workers & frees the shared table"""
+        self.__pool.terminate()
+        self.__pool.join()
+        self.table.close()
+
+
+def measure_scaling(
+    board: Board, wait_time: float, worker_counts: list[int]
+) -> list[dict]:
+    """Searches the same position with different numbers of
+    workers, each with a fresh table
+
+    Args:
+        board (Board): the board to search
+        wait_time (float): the time for each search
+        worker_counts (list[int]): the numbers of workers to try
+
+    Returns:
+        list[dict]: workers, depth, nodes per second & the scaling of
+            both compared to a single worker
+    """
+    rows = []
+
+    for workers in worker_counts:
+        engine = LazySMP(workers)
+        try:
+            _, stats = engine.search(board, wait_time)
+            nps = engine.nodes_per_second
+        finally:
+            engine.close()
+
+        rows.append({"workers": workers, "depth": stats.depth, "nps": nps})
+
+    base = rows[0]
+    for row in rows:
+        row["depth_gain"] = row["depth"] - base["depth"]
+        row["nps_scaling"] = row["nps"] / base["nps"] if base["nps"] else 0.0
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lazy SMP scaling report")
+    parser.add_argument("--time", type=float, default=3, help="seconds per search")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, LAZY_SMP_WORKERS}),
+        help="the numbers of workers to compare",
+    )
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'depth':>6} {'nps':>10} {'depth +':>8} {'nps x':>6}")
+    for row in measure_scaling(Board(None), args.time, args.workers):
+        print(
+            f"{row['workers']:>8} {row['depth']:>6} {row['nps']:>10.0f} "
+            f"{row['depth_gain']:>8} {row['nps_scaling']:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""Contains the perft tool: it counts the positions reached after
+every sequence of moves of a given length (the leaf nodes of the
+full move tree) & compares them with the counts stored for a set
+of positions, so any change to the move generation, Move.play or
+Board.undo_move that breaks a rule shows up as a wrong count.
+
+It also reports the nodes per second to measure the speed of the
+move generation and has a divide mode that gives the count below
+every move of the position to find where two counts differ.
+
+The counts follow the rules of this game (a side has to make the
+move that kills the most pieces & only complete chains are moves),
+so they are not the same as the counts for English draughts.
+
+    python -m src.perft                    check all the positions
+    python -m src.perft --divide 5         counts below each move
+    python -m src.perft --objects          use generate_moves & Move.play
+    python -m src.perft --verify           check the move generators too
+"""
+
+import sys
+import time
+import argparse
+
+from .board import Board
+from .move import (
+    generate_attacking_moves,
+    generate_move_codes,
+    generate_moves,
+    generate_sliding_moves,
+    move_name,
+    play_move,
+)
+from .utils import PieceTypes
+
+
+def _squares(rows_and_columns: str) -> list[int]:
+    """Turns "b6 d6" style names (column letter, row number from
+    the top) into indexes"""
+    return [
+        (int(name[1:]) - 1) * 8 + ord(name[0]) - ord("a")
+        for name in rows_and_columns.split()
+    ]
+
+
+# every position has its pieces, the side to play & the number of
+# leaf nodes at depth 1, 2, 3 ...
+PERFT_POSITIONS = {
+    "start": {
+        "board": None,
+        "side": PieceTypes.BLUE,
+        "counts": [7, 49, 302, 1469, 7361, 36473, 177532],
+    },
+    # a king in a lattice of men it can kill along different paths,
+    # the chains must not jump a killed piece again & the chains that
+    # end on the same square with the same kills are one move
+    "king loop": {
+        "blue": "a8 c8 h7",
+        "blue kings": "e6",
+        "red": "b1 h1 b3 d3 f3 b5 d5 f5",
+        "side": PieceTypes.BLUE,
+        "counts": [2, 13, 73, 393, 1632, 7668, 34398],
+    },
+    # men that become kings at the end of a double kill
+    "promotion": {
+        "blue": "d5 f5 c6 e6 b7 d7 h7 a8",
+        "red": "b1 h1 a2 e2 b3 h3 e4",
+        "side": PieceTypes.BLUE,
+        "counts": [2, 10, 68, 272, 1656, 6896, 38942],
+    },
+    # single kills are possible too but only the double kills are moves
+    "majority capture": {
+        "blue": "h5 c6 h7 e8",
+        "red": "b1 d1 h1 a2 a4 e4 g4",
+        "red kings": "g6",
+        "side": PieceTypes.BLUE,
+        "counts": [2, 15, 48, 229, 926, 4077, 16388],
+    },
+    # kings of both sides moving around a mostly empty board
+    "kings": {
+        "blue": "a6 b7",
+        "blue kings": "c2 b3 c4",
+        "red": "g6",
+        "red kings": "e8 g8",
+        "side": PieceTypes.RED,
+        "counts": [6, 60, 243, 2482, 12964, 125333],
+    },
+}
+
+
+def make_board(position: dict) -> Board:
+    """Sets up the board of one of the perft positions"""
+    if position.get("board", 0) is None:
+        return Board(None, position["side"])
+
+    squares = [0] * 64
+    for name, piece in (("blue", 1), ("blue kings", 2), ("red", -1), ("red kings", -2)):
+        for index in _squares(position.get(name, "")):
+            squares[index] = piece
+
+    return Board(squares, position["side"])
+
+
+def perft(board: Board, depth: int, buffers: list[list[int]] | None = None) -> int:
+    """Counts the leaf nodes of the move tree with the move codes.
+    The moves are generated into a list for every ply instead of
+    taken from the move cache, so the nps is the speed of the move
+    generation & not of the cache
+
+    Args:
+        board (Board): the board
+        depth (int): the number of moves
+        buffers (list[list[int]] | None, optional): the move list of
+            every ply. Defaults to new lists.
+
+    Returns:
+        int: the number of leaf nodes
+    """
+    if buffers is None:
+        buffers = [[] for _ in range(depth + 1)]
+
+    all_moves = generate_move_codes(board, buffers[depth])
+
+    if depth <= 1:
+        return len(all_moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in all_moves:
+        play_move(board, move)
+        nodes += perft(board, depth - 1, buffers)
+        board.undo_move()
+
+    return nodes
+
+
+def perft_objects(board: Board, depth: int) -> int:
+    """Counts the leaf nodes of the move tree with generate_moves,
+    Move.play & Board.undo_move like the game uses them
+
+    Args:
+        board (Board): the board
+        depth (int): the number of moves
+
+    Returns:
+        int: the number of leaf nodes
+    """
+    all_moves = generate_moves(board)
+
+    if depth <= 1:
+        return len(all_moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in all_moves:
+        move.play(board)
+        nodes += perft_objects(board, depth - 1)
+        board.undo_move()
+
+    return nodes
+
+
+def verify_position(board: Board):
+    """Checks the move generators against each other & that every
+    move is undone exactly
+
+    Args:
+        board (Board): the board
+
+    Raises:
+        AssertionError: when something does not match
+    """
+    is_blue = board.current_side == PieceTypes.BLUE
+    per_piece = []
+
+    for piece, start in board.all_pieces:
+        if (piece > 0) == is_blue:
+            per_piece += generate_attacking_moves(piece, start, board)
+
+    if per_piece:
+        # a side has to make the move that kills the most pieces
+        max_kills = max(len(move.kills) for move in per_piece)
+        per_piece = [move for move in per_piece if len(move.kills) == max_kills]
+    else:
+        for piece, start in board.all_pieces:
+            if (piece > 0) == is_blue:
+                per_piece += generate_sliding_moves(piece, start, board)
+
+    expected = {move.code for move in per_piece}
+    moves = generate_moves(board)
+    assert {move.code for move in moves} == expected, "the move generators differ"
+    assert len(moves) == len(expected), "a move was generated twice"
+
+    state = (board.blue, board.red, board.kings, board.key, board.current_side)
+    sums = (board.material, board.center_distance)
+
+    for move in moves:
+        move.play(board)
+        assert board.key == board.compute_key(), "the key was not updated"
+        board.undo_move()
+
+        assert state == (
+            board.blue,
+            board.red,
+            board.kings,
+            board.key,
+            board.current_side,
+        ), f"{move} was not undone"
+        assert sums == (board.material, board.center_distance), "the sums changed"
+
+
+def perft_verify(board: Board, depth: int) -> int:
+    """Counts the leaf nodes like perft_objects & verifies every position"""
+    verify_position(board)
+    all_moves = generate_moves(board)
+
+    if depth <= 1:
+        return len(all_moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in all_moves:
+        move.play(board)
+        nodes += perft_verify(board, depth - 1)
+        board.undo_move()
+
+    return nodes
+
+
+def divide(board: Board, depth: int, counter=perft) -> dict[str, int]:
+    """Counts the leaf nodes below every move of the position
+
+    Args:
+        board (Board): the board
+        depth (int): the number of moves, including the first one
+        counter (optional): the perft function to count with. Defaults to perft.
+
+    Returns:
+        dict[str, int]: the count of every move
+    """
+    counts = {}
+
+    for move in generate_move_codes(board, []):
+        play_move(board, move)
+        counts[move_name(move)] = counter(board, depth - 1)
+        board.undo_move()
+
+    return counts
+
+
+def run_suite(max_depth: int | None = None, counter=perft, names=None) -> bool:
+    """Checks the counts of the perft positions & prints the results
+
+    Args:
+        max_depth (int | None, optional): the deepest depth to check.
+            Defaults to all the stored depths.
+        counter (optional): the perft function to count with. Defaults to perft.
+        names (list[str] | None, optional): the positions to check.
+            Defaults to all of them.
+
+    Returns:
+        bool: whether every count was right
+    """
+    all_correct = True
+    total_nodes, total_time = 0, 0.0
+
+    print(f"{'position':<18} {'depth':>5} {'nodes':>10} {'expected':>10} {'nps':>10}")
+
+    for name in names or PERFT_POSITIONS:
+        position = PERFT_POSITIONS[name]
+        board = make_board(position)
+
+        for depth, expected in enumerate(position["counts"], 1):
+            if max_depth is not None and depth > max_depth:
+                break
+
+            start_time = time.perf_counter()
+            nodes = counter(board, depth)
+            time_taken = time.perf_counter() - start_time
+
+            total_nodes += nodes
+            total_time += time_taken
+            all_correct &= nodes == expected
+
+            print(
+                f"{name:<18} {depth:>5} {nodes:>10} {expected:>10} "
+                f"{nodes / max(time_taken, 1e-9):>10.0f}"
+                + ("" if nodes == expected else "  WRONG")
+            )
+
+    print(
+        f"{total_nodes} nodes in {total_time:.2f}s, {total_nodes / total_time:.0f} nps"
+    )
+    return all_correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft for the move generation")
+    parser.add_argument("--depth", type=int, default=None, help="the deepest depth")
+    parser.add_argument(
+        "--position",
+        choices=list(PERFT_POSITIONS),
+        action="append",
+        help="the positions to use, all by default",
+    )
+    parser.add_argument(
+        "--divide", type=int, metavar="DEPTH", help="show the count of every move"
+    )
+    parser.add_argument(
+        "--objects",
+        action="store_true",
+        help="count with generate_moves & Move.play instead of move codes",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="check the move generators & the undo in every position",
+    )
+    args = parser.parse_args()
+
+    counter = perft
+    if args.objects:
+        counter = perft_objects
+    if args.verify:
+        counter = perft_verify
+
+    if args.divide is not None:
+        for name in args.position or ["start"]:
+            board = make_board(PERFT_POSITIONS[name])
+            counts = divide(board, args.divide, counter)
+
+            print(name)
+            for move, nodes in counts.items():
+                print(f"  {move:<8} {nodes}")
+            print(f"  {'total':<8} {sum(counts.values())}")
+        return
+
+    if not run_suite(args.depth, counter, args.position):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
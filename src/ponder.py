@@ -0,0 +1,137 @@
+"""Contains pondering: searching on the time of the player.
+
+After the ai plays its move the reply of the player is guessed
+(the best move stored for the position in the transposition table)
+and the position after it is searched in a thread, without a time
+limit, while the player thinks.
+
+When the player makes the guessed move the search carries on as
+the search of the ai's next move & only gets its time limits then,
+so the time the player thought is free. Any other move cancels it,
+everything it stored in the transposition table stays there.
+"""
+
+import copy
+import time
+import threading
+from math import inf
+
+from . import ai
+from .board import Board
+from .move import legal_moves, play_move
+from .stats import SearchStats
+
+
+class Ponderer:
+    """Runs the ponder search of a game in a thread, with the
+    engine the game searches its moves with"""
+
+    def __init__(self, engine: ai.SearchEngine | None = None):
+        self.engine = engine if engine is not None else ai.DEFAULT_ENGINE
+        self.key: int | None = None
+        self.predicted_move: int | None = None
+        self.start_time = 0.0
+
+        self.__thread: threading.Thread | None = None
+        self.__result: SearchStats | None = None
+
+    @property
+    def is_pondering(self) -> bool:
+        return self.__thread is not None
+
+    def start(self, board: Board) -> bool:
+        """Guesses the reply to the last move & searches the position after it
+
+        Args:
+            board (Board): the board of the game, after the ai's move
+
+        Returns:
+            bool: whether it started pondering
+        """
+        self.stop()
+
+        if not board.is_playing:
+            return False
+
+        predicted_move = self.engine.predicted_move(board)
+        if predicted_move is None:
+            return False
+
+        ponder_board = copy.deepcopy(board)
+        play_move(ponder_board, predicted_move)
+
+        root_moves = list(legal_moves(ponder_board))
+        if len(root_moves) <= 1:
+            # a forced move is played without searching anyway
+            return False
+
+        self.key = ponder_board.key
+        self.predicted_move = predicted_move
+        self.__result = None
+        self.start_time = time.monotonic()
+
+        self.engine.clear_stop()
+
+        self.__thread = threading.Thread(
+            target=self.__search, args=(ponder_board, root_moves), daemon=True
+        )
+        self.__thread.start()
+        return True
+
+    def __search(self, board: Board, root_moves: list[int]):
+        self.engine.iterative_deepening(board, inf, root_moves)
+        self.__result = self.engine.stats
+
+    def finish(
+        self, board: Board, time_limit: float, soft_limit: float
+    ) -> tuple[int, SearchStats] | None:
+        """Uses the ponder search for the ai's move if the player made
+        the guessed move, otherwise it is cancelled
+
+        Args:
+            board (Board): the board of the game, after the player's move
+            time_limit (float): the hard limit of the move
+            soft_limit (float): the soft limit of the move
+
+        Returns:
+            tuple[int, SearchStats] | None: best move code & the statistics
+                of the search or None when the guess was wrong
+        """
+        if self.__thread is None:
+            return None
+
+        if board.key != self.key:
+            self.stop()
+            return None
+
+        # the time spent pondering counts towards the soft limit, so a
+        # long think of the player can make the reply instant, but the
+        # hard limit is only counted from now
+        now = time.monotonic()
+        engine = self.engine
+        engine.soft_stop_time = (
+            self.start_time + soft_limit * ai.NEXT_ITERATION_TIME_RATIO
+        )
+        engine.stop_time = (
+            now if now - self.start_time >= soft_limit else now + time_limit
+        )
+
+        self.__thread.join()
+        self.__thread = None
+        engine.clear_stop()
+
+        if self.__result is None:
+            return None
+
+        return self.__result.best_move, self.__result  # type: ignore
+
+    def stop(self):
+        """Cancels the ponder search"""
+        if self.__thread is None:
+            return
+
+        self.engine.stop()
+        self.__thread.join()
+
+        self.__thread = None
+        self.engine.clear_stop()
@@ -0,0 +1,410 @@
+"""Contains the game server: many games of checkers over HTTP &
+WebSocket in one process, without pygame.
+
+The games live in this process & only move when a client asks:
+a client plays its own moves & asks for the move of the engine
+whenever it wants the ai to play. The searches run in a bounded
+pool of processes (every worker process searches with its own
+engine, see ai.py) so they never block the server. A search gets
+the time budget of the request or else the time from the clock
+of the game (see time_manager.py), counted from when the request
+arrived, & when too many searches are waiting the request is
+refused instead of queued.
+
+    python -m src.server --port 8000 --workers 4
+
+HTTP:
+    POST   /games                   makes a game
+    GET    /games/<id>              the state of the game
+    GET    /games/<id>/moves        the legal moves
+    POST   /games/<id>/moves        plays {"start": .., "end": ..}
+    POST   /games/<id>/engine-move  plays the move of the engine,
+                                    {"time": ..} is optional
+    DELETE /games/<id>              removes the game
+
+WebSocket /games/<id>/ws takes {"type": "state" | "moves" | "move" |
+"engine_move", ...} messages & answers each with the same result
+as the HTTP request, or {"type": "error", "status": .., "error": ..}
+"""
+
+import os
+import copy
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from quart import Quart, request, websocket
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from . import ai
+from .board import Board
+from .game import Game
+from .move import Move, move_name
+from .stats import SearchStats
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+ENGINE_WORKERS = os.cpu_count() or 1
+
+# searches waiting for a worker or running, more are refused
+MAX_QUEUED_SEARCHES = 64
+
+# the longest search a request can ask for in seconds
+MAX_SEARCH_TIME = 10
+
+# the most games the server keeps at the same time
+MAX_GAMES = 1000
+
+# the games never search in this process (the pool does) so
+# they all get the same engine with the smallest table
+IDLE_ENGINE = ai.SearchEngine(0)
+
+
+class RequestError(Exception):
+    """A request that cannot be done, with its HTTP status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _search(
+    board: Board, time_limit: float, soft_limit: float, request_time: float
+) -> tuple[int, SearchStats]:
+    """Searches the best move in a worker process of the pool
+
+    Args:
+        board (Board): the board
+        time_limit (float): the hard limit of the search
+        soft_limit (float): the soft limit of the search
+        request_time (float): when the request arrived (from time.time),
+            the time it waited for the worker is taken off the limits
+
+    Returns:
+        tuple[int, SearchStats]: best move code & the statistics
+    """
+    waited = max(0.0, time.time() - request_time)
+    time_limit = max(0.0, time_limit - waited)
+    soft_limit = min(soft_limit, time_limit)
+
+    move, stats = ai.search_best_move(board, time_limit, soft_limit)
+    return move.code, stats
+
+
+def move_json(move: Move) -> dict:
+    """The move as a dict for the clients"""
+    return {
+        "start": move.start,
+        "end": move.end,
+        "kills": move.kills,
+        "make_king": move.make_king,
+        "name": move_name(move.code),
+    }
+
+
+class GameServer:
+    """The games of the server & the pool their searches run in"""
+
+    def __init__(
+        self,
+        workers: int = ENGINE_WORKERS,
+        max_queued: int = MAX_QUEUED_SEARCHES,
+        max_games: int = MAX_GAMES,
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_games = max_games
+
+        self.games: dict[str, Game] = {}
+        self.searching: set[str] = set()
+        self.pool: ProcessPoolExecutor | None = None
+
+    def start(self):
+        self.pool = ProcessPoolExecutor(self.workers)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def restart(self, broken: ProcessPoolExecutor):
+        """Replaces a broken pool with a new one, unless another
+        search already did"""
+        if self.pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool = ProcessPoolExecutor(self.workers)
+
+    def game(self, game_id: str) -> Game:
+        """Finds a game
+
+        Raises:
+            RequestError: 404 when there is no such game
+        """
+        game = self.games.get(game_id)
+        if game is None:
+            raise RequestError(404, f"there is no game {game_id}")
+        return game
+
+    def state(self, game_id: str) -> dict:
+        """The board, the side to play & the result of a game"""
+        game = self.game(game_id)
+        board = game.board
+
+        return {
+            "id": game_id,
+            "board": board.board,
+            "side": board.current_side.name.lower(),
+            "is_playing": board.is_playing,
+            "winner": board.winner,
+            "clocks": {
+                side.name.lower(): round(clock.remaining, 3)
+                for side, clock in game.clocks.items()
+            },
+            "searching": game_id in self.searching,
+        }
+
+    def create_game(self) -> dict:
+        """Makes a new game, both sides are played by the client
+        & the engine only moves when it is asked to
+
+        Raises:
+            RequestError: 503 when the server has too many games
+        """
+        if len(self.games) >= self.max_games:
+            raise RequestError(503, "the server has too many games")
+
+        game_id = uuid.uuid4().hex
+        self.games[game_id] = Game("client", "client", search_engine=IDLE_ENGINE)
+        return self.state(game_id)
+
+    def remove_game(self, game_id: str) -> dict:
+        self.game(game_id)
+        del self.games[game_id]
+        return {"id": game_id}
+
+    def legal_moves(self, game_id: str) -> dict:
+        game = self.game(game_id)
+        return {"id": game_id, "moves": [move_json(move) for move in game.moves]}
+
+    def __playable_game(self, game_id: str) -> Game:
+        game = self.game(game_id)
+
+        if not game.board.is_playing:
+            raise RequestError(409, "the game is over")
+        if game_id in self.searching:
+            raise RequestError(409, "the engine is searching the move of the game")
+
+        return game
+
+    def play_move(self, game_id: str, payload: dict) -> dict:
+        """Plays a move of the client
+
+        Args:
+            game_id (str): the id of the game
+            payload (dict): the start & end square of the move
+
+        Raises:
+            RequestError: 400 when the move is not legal
+        """
+        game = self.__playable_game(game_id)
+
+        try:
+            move = game.find_move(int(payload["start"]), int(payload["end"]))
+        except (KeyError, TypeError, ValueError) as error:
+            raise RequestError(400, f"not a legal move: {error}") from error
+
+        game.update_game(move)
+        return {"move": move_json(move), "state": self.state(game_id)}
+
+    async def engine_move(self, game_id: str, payload: dict) -> dict:
+        """Searches the move of the side to play in the pool & plays it
+
+        Args:
+            game_id (str): the id of the game
+            payload (dict): the time budget of the search in "time",
+                without it the clock of the game decides
+
+        Raises:
+            RequestError: 503 when too many searches are waiting or
+                the pool stopped before the search ended
+        """
+        game = self.__playable_game(game_id)
+
+        if self.pool is None or len(self.searching) >= self.max_queued:
+            raise RequestError(503, "the engine is busy")
+
+        clock = game.clocks[game.board.current_side]
+        soft_limit, time_limit = clock.limits(game.board, len(game.moves))
+
+        if payload.get("time") is not None:
+            try:
+                budget = float(payload["time"])
+            except (TypeError, ValueError) as error:
+                raise RequestError(400, f"not a time: {error}") from error
+
+            soft_limit = time_limit = max(0.0, budget)
+
+        time_limit = min(time_limit, MAX_SEARCH_TIME)
+        soft_limit = min(soft_limit, time_limit)
+
+        start_time = time.time()
+        pool = self.pool
+        self.searching.add(game_id)
+        try:
+            # the board is copied so the pool never sees it change
+            best_move, stats = await asyncio.get_running_loop().run_in_executor(
+                pool,
+                _search,
+                copy.deepcopy(game.board),
+                time_limit,
+                soft_limit,
+                start_time,
+            )
+        except BrokenProcessPool as error:
+            # a worker died (like killed for its memory) & the pool
+            # cannot run anything any more, so it is made again
+            self.restart(pool)
+            raise RequestError(503, "the engine stopped, try again") from error
+        except asyncio.CancelledError as error:
+            # the search is cancelled when the pool shuts down but
+            # a request that was cancelled itself stays cancelled
+            if self.pool is pool:
+                raise
+            raise RequestError(503, "the server is stopping") from error
+        finally:
+            self.searching.discard(game_id)
+
+        if self.games.get(game_id) is not game:
+            raise RequestError(404, f"the game {game_id} was removed")
+
+        clock.update(time.time() - start_time)
+        game.stats = stats
+
+        move = Move.from_code(best_move)
+        game.update_game(move)
+
+        return {
+            "move": move_json(move),
+            "stats": stats.as_dict(),
+            "state": self.state(game_id),
+        }
+
+
+def create_app(server: GameServer) -> Quart:
+    """Makes the app with the HTTP & WebSocket routes of the server
+
+    Args:
+        server (GameServer): the games & the pool
+
+    Returns:
+        Quart: the app
+    """
+    app = Quart(__name__)
+
+    @app.before_serving
+    async def start_pool():
+        server.start()
+
+    @app.after_serving
+    async def close_pool():
+        server.close()
+
+    @app.errorhandler(RequestError)
+    async def request_error(error: RequestError):
+        return {"error": error.message}, error.status
+
+    async def payload() -> dict:
+        data = await request.get_json(force=True, silent=True)
+        return data if isinstance(data, dict) else {}
+
+    @app.post("/games")
+    async def create_game():
+        return server.create_game(), 201
+
+    @app.get("/games/<game_id>")
+    async def game_state(game_id: str):
+        return server.state(game_id)
+
+    @app.delete("/games/<game_id>")
+    async def remove_game(game_id: str):
+        return server.remove_game(game_id)
+
+    @app.get("/games/<game_id>/moves")
+    async def legal_moves(game_id: str):
+        return server.legal_moves(game_id)
+
+    @app.post("/games/<game_id>/moves")
+    async def play_move(game_id: str):
+        return server.play_move(game_id, await payload())
+
+    @app.post("/games/<game_id>/engine-move")
+    async def engine_move(game_id: str):
+        return await server.engine_move(game_id, await payload())
+
+    @app.websocket("/games/<game_id>/ws")
+    async def game_socket(game_id: str):
+        while True:
+            message = await websocket.receive()
+
+            try:
+                message = json.loads(message)
+                if not isinstance(message, dict):
+                    raise ValueError("a message must be a JSON object")
+
+                kind = message.get("type")
+
+                if kind == "state":
+                    result = server.state(game_id)
+                elif kind == "moves":
+                    result = server.legal_moves(game_id)
+                elif kind == "move":
+                    result = server.play_move(game_id, message)
+                elif kind == "engine_move":
+                    result = await server.engine_move(game_id, message)
+                else:
+                    raise RequestError(400, f"unknown message type {kind}")
+
+                await websocket.send(json.dumps({"type": kind, **result}))
+
+            except ValueError as error:
+                await websocket.send(
+                    json.dumps({"type": "error", "status": 400, "error": str(error)})
+                )
+            except RequestError as error:
+                await websocket.send(
+                    json.dumps(
+                        {
+                            "type": "error",
+                            "status": error.status,
+                            "error": error.message,
+                        }
+                    )
+                )
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkers game server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=ENGINE_WORKERS)
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED_SEARCHES)
+    parser.add_argument("--max-games", type=int, default=MAX_GAMES)
+    args = parser.parse_args()
+
+    app = create_app(GameServer(args.workers, args.max_queued, args.max_games))
+
+    config = Config()
+    config.bind = [f"{args.host}:{args.port}"]
+    asyncio.run(serve(app, config))
+
+
+if __name__ == "__main__":
+    main()
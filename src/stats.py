@@ -0,0 +1,152 @@
+"""Contains the statistics of a search: what the search did
+at every depth & how well the move ordering & the transposition
+table worked, to see the effect of every change to the search.
+"""
+
+
+class SearchStats:
+    """The numbers of one search, iterative_deepening fills them in.
+
+    A node is every call of the search & a quiescence node every
+    call of the quiescence search. The transposition table numbers
+    are the probes, hits & stores of the table during the search
+    """
+
+    def __init__(self, source: str = "search"):
+        # where the move came from: search, book, tablebase or forced
+        self.source = source
+
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.pvs_researches = 0
+        self.lmr_researches = 0
+
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_stores = 0
+
+        self.best_move: int | None = None
+        self.score = 0.0
+        self.depth = 0
+        self.time = 0.0
+
+        # (depth, nodes, time) of every completed iteration
+        self.iterations: list[tuple[int, int, float]] = []
+
+        self.__table_counters = (0, 0, 0)
+        self.__iteration_nodes = 0
+
+    @property
+    def total_nodes(self) -> int:
+        """The nodes & the quiescence nodes together"""
+        return self.nodes + self.quiescence_nodes
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.total_nodes / self.time if self.time > 0 else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """The ratio of the cutoffs that came from the first move searched"""
+        if self.beta_cutoffs == 0:
+            return 0.0
+        return self.first_move_cutoffs / self.beta_cutoffs
+
+    @property
+    def tt_hit_rate(self) -> float:
+        """The ratio of the probes that found their position"""
+        return self.tt_hits / self.tt_probes if self.tt_probes > 0 else 0.0
+
+    @property
+    def effective_branching_factor(self) -> float:
+        """How many times more nodes the last iteration took than the one before"""
+        if len(self.iterations) < 2 or self.iterations[-2][1] == 0:
+            return 0.0
+        return self.iterations[-1][1] / self.iterations[-2][1]
+
+    @property
+    def nodes_per_depth(self) -> dict[int, int]:
+        return {depth: nodes for depth, nodes, _ in self.iterations}
+
+    def start(self, table):
+        """Remembers the counters of the transposition table at the start
+
+        Args:
+            table (TranspositionTable | SharedTranspositionTable): the table
+        """
+        self.__table_counters = (table.hits, table.misses, table.stores)
+        self.__iteration_nodes = self.total_nodes
+
+    def end_iteration(self, depth: int, time_taken: float):
+        """Records a completed iteration
+
+        Args:
+            depth (int): the depth of the iteration
+            time_taken (float): the time the iteration took
+        """
+        self.iterations.append(
+            (depth, self.total_nodes - self.__iteration_nodes, time_taken)
+        )
+        self.__iteration_nodes = self.total_nodes
+
+    def finish(
+        self, table, best_move: int, score: float, depth: int, time_taken: float
+    ):
+        """Records the result of the search & what the table did during it
+
+        Args:
+            table (TranspositionTable | SharedTranspositionTable): the table
+            best_move (int): the best move code
+            score (float): its score
+            depth (int): the depth of the last completed iteration
+            time_taken (float): the time the search took
+        """
+        hits, misses, stores = self.__table_counters
+        self.tt_hits = table.hits - hits
+        self.tt_probes = self.tt_hits + table.misses - misses
+        self.tt_stores = table.stores - stores
+
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.time = time_taken
+
+    def merge(self, other: "SearchStats"):
+        """Adds the counters of another search of the same position,
+        like the one of another worker of the parallel search"""
+        self.nodes += other.nodes
+        self.quiescence_nodes += other.quiescence_nodes
+        self.beta_cutoffs += other.beta_cutoffs
+        self.first_move_cutoffs += other.first_move_cutoffs
+        self.pvs_researches += other.pvs_researches
+        self.lmr_researches += other.lmr_researches
+        self.tt_probes += other.tt_probes
+        self.tt_hits += other.tt_hits
+        self.tt_stores += other.tt_stores
+        self.time = max(self.time, other.time)
+
+    def as_dict(self) -> dict:
+        """The statistics as a dict (for JSON)"""
+        return {
+            "source": self.source,
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "quiescence_nodes": self.quiescence_nodes,
+            "time": self.time,
+            "nps": self.nodes_per_second,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_stores": self.tt_stores,
+            "tt_hit_rate": self.tt_hit_rate,
+            "beta_cutoffs": self.beta_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+            "pvs_researches": self.pvs_researches,
+            "lmr_researches": self.lmr_researches,
+            "effective_branching_factor": self.effective_branching_factor,
+            "iterations": [
+                {"depth": depth, "nodes": nodes, "time": time_taken}
+                for depth, nodes, time_taken in self.iterations
+            ],
+        }
@@ -0,0 +1,523 @@
+"""Contains the endgame tablebases: the exact result (win, loss
+or draw & how many plies it takes) of every position with only
+a few pieces left, worked out offline by retrograde analysis.
+
+The positions are split into slices by the number of men & kings
+of both sides & every slice is a file of one byte per position:
+    0          a draw
+    odd n      the side to play wins in n plies
+    even n     the side to play loses in n - 2 plies
+A position where it is red to play is rotated by 180 degrees and
+has its colours swapped first, so the tables only hold positions
+with blue to play. The index of a position is worked out from the
+squares of its pieces (see position_index) so nothing is hashed
+& the files are read straight from memory maps which the operating
+system shares between all the processes using them.
+
+The tables only know the rules of the moves, not the 40 moves
+without kills or the repetition draws which depend on the moves
+played before & are still checked by the board.
+
+Run `python -m src.tablebase --pieces 4` to generate them.
+"""
+
+import os
+import mmap
+import time
+import argparse
+from array import array
+from math import comb
+
+from .bitboard import BLUE_KING_ROW, FULL_MASK, SQUARE_TO_BIT, iterate_bits
+from .board import Board
+from .move import CAPTURES_SHIFT, END_SHIFT, KING_FLAG, generate_move_codes
+from .utils import PieceTypes
+
+TABLEBASE_DIRECTORY = "./assets/tablebases"
+MAX_PIECES = 4
+
+DRAW = 0
+WIN = 1
+LOSS = -1
+
+# while solving a position is scored as MATE - n for a win in n plies,
+# -(MATE - n) for a loss in n plies & 0 while it is not known (a draw)
+MATE = 1000
+NO_SCORE = -32767
+
+# the colex rank of a set of squares uses the binomial coefficients
+COMB = [[comb(n, k) for k in range(8)] for n in range(33)]
+
+# every byte with its bits in reverse order
+REVERSED_BYTES = [int(f"{byte:08b}"[::-1], 2) for byte in range(256)]
+
+
+def rotate(mask: int) -> int:
+    """Rotates a mask by 180 degrees, bit i becomes bit 31 - i"""
+    return (
+        REVERSED_BYTES[mask & 0xFF] << 24
+        | REVERSED_BYTES[mask >> 8 & 0xFF] << 16
+        | REVERSED_BYTES[mask >> 16 & 0xFF] << 8
+        | REVERSED_BYTES[mask >> 24]
+    )
+
+
+def normalize(board) -> tuple[int, int, int]:
+    """Gets the masks of a position with the side to play as blue
+
+    Args:
+        board (Board): the board
+
+    Returns:
+        tuple[int, int, int]: the pieces to play, the opponents & the kings
+    """
+    if board.current_side == PieceTypes.BLUE:
+        return board.blue, board.red, board.kings
+
+    return rotate(board.red), rotate(board.blue), rotate(board.kings)
+
+
+def slice_of(own: int, opponents: int, kings: int) -> tuple[int, int, int, int]:
+    """Gets the slice of a position: the men & kings of the side
+    to play followed by the men & kings of the opponent"""
+    return (
+        (own & ~kings).bit_count(),
+        (own & kings).bit_count(),
+        (opponents & ~kings).bit_count(),
+        (opponents & kings).bit_count(),
+    )
+
+
+def slice_size(table: tuple[int, int, int, int]) -> int:
+    """The number of indexes in a slice.
+
+    The men of the side to play are placed first on the 28 squares
+    they can stand on, then the opponent men, the kings of the side
+    to play & the opponent kings on the squares still empty. Only the
+    indexes of opponent men on their own king row are never used
+    """
+    men, kings, opponent_men, opponent_kings = table
+    empty = 32 - men - opponent_men
+
+    return (
+        COMB[28][men]
+        * COMB[32 - men][opponent_men]
+        * COMB[empty][kings]
+        * COMB[empty - kings][opponent_kings]
+    )
+
+
+def _rank(mask: int, occupied: int, offset: int = 0) -> int:
+    """The colex rank of the squares of a mask among the squares
+    which are not occupied (& not below the offset)"""
+    rank = 0
+
+    for count, bit in enumerate(iterate_bits(mask), 1):
+        below = occupied & ((1 << bit) - 1)
+        rank += COMB[bit - offset - below.bit_count()][count]
+
+    return rank
+
+
+def position_index(own: int, opponents: int, kings: int) -> int:
+    """Gets the index of a position inside its slice
+
+    Args:
+        own (int): the pieces of the side to play (as blue)
+        opponents (int): the pieces of the opponent
+        kings (int): the kings of both sides
+
+    Returns:
+        int: the index of the position
+    """
+    men, own_kings = own & ~kings, own & kings
+    opponent_men, opponent_kings = opponents & ~kings, opponents & kings
+    table = slice_of(own, opponents, kings)
+    empty = 32 - table[0] - table[2]
+
+    # the men of blue can never be on the first row (bits 0 - 3)
+    index = _rank(men, 0, 4)
+    index = index * COMB[32 - table[0]][table[2]] + _rank(opponent_men, men)
+    index = index * COMB[empty][table[1]] + _rank(own_kings, men | opponent_men)
+    index = index * COMB[empty - table[1]][table[3]] + _rank(
+        opponent_kings, men | opponent_men | own_kings
+    )
+
+    return index
+
+
+def file_name(table: tuple[int, int, int, int]) -> str:
+    """The name of the file of a slice, eg 1021.tb"""
+    return "".join(map(str, table)) + ".tb"
+
+
+def decode(value: int) -> tuple[int, int]:
+    """Turns the byte of a position into (result, distance in plies)"""
+    if value == 0:
+        return DRAW, 0
+    if value % 2:
+        return WIN, value
+    return LOSS, value - 2
+
+
+class Tablebase:
+    """All the slices found in a directory, each one memory mapped
+    when it is first needed. `max_pieces` is the most pieces for
+    which every slice is there, positions with more are not probed
+    """
+
+    def __init__(self, directory: str = TABLEBASE_DIRECTORY):
+        self.directory = directory
+        self.hits = 0
+        self.__tables: dict[tuple[int, int, int, int], mmap.mmap | None] = {}
+
+        names = set(os.listdir(directory)) if os.path.isdir(directory) else set()
+
+        self.max_pieces = 0
+        for pieces in range(2, 33):
+            if any(file_name(table) not in names for table in all_slices(pieces)):
+                break
+            self.max_pieces = pieces
+
+    def table(self, table: tuple[int, int, int, int]) -> mmap.mmap | None:
+        """Gets the memory map of a slice
+
+        Args:
+            table (tuple[int, int, int, int]): the slice
+
+        Returns:
+            mmap.mmap | None: the bytes of the slice or None if it is missing
+        """
+        if table not in self.__tables:
+            path = os.path.join(self.directory, file_name(table))
+
+            if not os.path.exists(path):
+                self.__tables[table] = None
+            else:
+                with open(path, "rb") as file:
+                    self.__tables[table] = mmap.mmap(
+                        file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+
+        return self.__tables[table]
+
+    def probe_masks(self, own: int, opponents: int, kings: int) -> int | None:
+        """Gets the byte of a position with the side to play as blue
+
+        Args:
+            own (int): the pieces of the side to play
+            opponents (int): the pieces of the opponent
+            kings (int): the kings of both sides
+
+        Returns:
+            int | None: the byte of the position or None if it is not known
+        """
+        if not own:
+            return 2  # no pieces left, lost
+
+        data = self.table(slice_of(own, opponents, kings))
+        if data is None:
+            return None
+
+        return data[position_index(own, opponents, kings)]
+
+    def probe(self, board) -> tuple[int, int] | None:
+        """Looks up the result of a position for the side to play
+
+        Args:
+            board (Board): the board
+
+        Returns:
+            tuple[int, int] | None: WIN, LOSS or DRAW & the distance
+                in plies or None if the position is not in the tables
+        """
+        if (board.blue | board.red).bit_count() > self.max_pieces:
+            return None
+
+        value = self.probe_masks(*normalize(board))
+        if value is None:
+            return None
+
+        self.hits += 1
+        return decode(value)
+
+    def close(self):
+        """Closes all the memory maps"""
+        for data in self.__tables.values():
+            if data is not None:
+                data.close()
+
+        self.__tables.clear()
+
+
+def all_slices(pieces: int) -> list[tuple[int, int, int, int]]:
+    """All the slices where both sides have a piece & there are
+    the given number of pieces, in the order they have to be solved:
+    the fewer men the earlier, as a man can only ever become a king"""
+    tables = []
+
+    for men in range(pieces + 1):
+        for kings in range(pieces + 1 - men):
+            for opponent_men in range(pieces + 1 - men - kings):
+                opponent_kings = pieces - men - kings - opponent_men
+
+                if men + kings and opponent_men + opponent_kings:
+                    tables.append((men, kings, opponent_men, opponent_kings))
+
+    return sorted(tables, key=lambda table: table[0] + table[2])
+
+
+class _Position:
+    """The bare position the move generation needs, blue is always to play"""
+
+    __slots__ = ("blue", "red", "kings")
+    current_side = PieceTypes.BLUE
+    piece = Board.piece
+
+    def __init__(self):
+        self.blue = 0
+        self.red = 0
+        self.kings = 0
+
+
+def _placements(mask: int, count: int):
+    """Iterates over every way of placing count pieces on the bits of mask"""
+    if count == 0:
+        yield 0
+        return
+
+    for bit in iterate_bits(mask):
+        high = mask & ~((2 << bit) - 1)
+        for rest in _placements(high, count - 1):
+            yield 1 << bit | rest
+
+
+def _positions(table: tuple[int, int, int, int]):
+    """Iterates over every legal position of a slice as
+    (own, opponents, kings, index), the rank of every group of
+    pieces is only worked out once for all the positions sharing it"""
+    men, kings, opponent_men, opponent_kings = table
+    empty_count = 32 - men - opponent_men
+    # red men are never on the row where they become kings
+    red_men_squares = FULL_MASK >> 4
+
+    for own_men in _placements(FULL_MASK & ~BLUE_KING_ROW, men):
+        index = _rank(own_men, 0, 4) * COMB[32 - men][opponent_men]
+
+        for their_men in _placements(red_men_squares & ~own_men, opponent_men):
+            all_men = own_men | their_men
+            men_index = (index + _rank(their_men, own_men)) * COMB[empty_count][kings]
+            empty = FULL_MASK & ~all_men
+
+            for own_kings in _placements(empty, kings):
+                kings_index = men_index + _rank(own_kings, all_men)
+                kings_index *= COMB[empty_count - kings][opponent_kings]
+
+                for their_kings in _placements(empty & ~own_kings, opponent_kings):
+                    yield (
+                        all_men & ~their_men | own_kings,
+                        their_men | their_kings,
+                        own_kings | their_kings,
+                        kings_index + _rank(their_kings, all_men | own_kings),
+                    )
+
+
+def _child(own: int, opponents: int, kings: int, code: int):
+    """Plays a move code on a position (with blue to play) & gives
+    the new position normalized for the opponent who is to play next"""
+    start = 1 << SQUARE_TO_BIT[code & 63]  # type: ignore
+    end = 1 << SQUARE_TO_BIT[code >> END_SHIFT & 63]  # type: ignore
+    captures = code >> CAPTURES_SHIFT
+
+    new_kings = kings & ~start & ~captures
+    if kings & start or code & KING_FLAG:
+        new_kings |= end
+
+    own = own & ~start | end
+    opponents &= ~captures
+
+    return rotate(opponents), rotate(own), rotate(new_kings)
+
+
+def _from_byte(value: int) -> int:
+    """Turns the byte of a position into its solving score"""
+    result, distance = decode(value)
+    return result * (MATE - distance) if result != DRAW else 0
+
+
+def solve(tables: list[tuple[int, int, int, int]], tablebase: Tablebase) -> dict:
+    """Solves slices which only depend on each other & on the
+    slices already in the tablebase.
+
+    Every move of every position is played once: moves into a solved
+    slice (kills & new kings) give a known score straight away and the
+    moves that stay in these slices are kept as edges. Then all the
+    positions are scored again & again from the scores of their edges,
+    one ply further every time, until nothing changes any more. What
+    is still unknown then can never be forced & is a draw
+
+    Args:
+        tables (list[tuple[int, int, int, int]]): the slices to solve
+        tablebase (Tablebase): the tablebase with the solved slices
+
+    Returns:
+        dict: the solving score of every position of each slice
+    """
+    # only the generator needs numpy, probing the tables works without it
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    offsets, total = {}, 0
+    for table in tables:
+        offsets[table] = total
+        total += slice_size(table)
+
+    known = np.full(total, NO_SCORE, np.int16)
+    is_legal = np.zeros(total, bool)
+
+    # the edges of every position that has any are stored one after the other
+    edges, edge_starts, edge_owners = array("q"), array("q"), array("q")
+
+    position = _Position()
+    moves: list[int] = []
+
+    for table in tables:
+        offset = offsets[table]
+
+        for own, opponents, kings, index in _positions(table):
+            number = offset + index
+            is_legal[number] = True
+
+            position.blue, position.red, position.kings = own, opponents, kings
+            generate_move_codes(position, moves)
+
+            if not moves:
+                known[number] = -MATE
+                continue
+
+            best = NO_SCORE
+            first_edge = len(edges)
+
+            for code in moves:
+                child = _child(own, opponents, kings, code)
+                child_table = slice_of(*child)
+
+                if child_table in offsets:
+                    edges.append(offsets[child_table] + position_index(*child))
+                    continue
+
+                score = -_from_byte(tablebase.probe_masks(*child))  # type: ignore
+                best = max(best, score - 1 if score > 0 else score + (score < 0))
+
+            known[number] = best
+            if len(edges) > first_edge:
+                edge_starts.append(first_edge)
+                edge_owners.append(number)
+
+    targets = np.frombuffer(edges, np.int64)
+    starts = np.frombuffer(edge_starts, np.int64)
+    owners = np.frombuffer(edge_owners, np.int64)
+    legal = np.flatnonzero(is_legal)
+
+    scores = np.zeros(total, np.int16)
+    while True:
+        new_scores = np.zeros(total, np.int16)
+        new_scores[legal] = known[legal]
+
+        if len(targets):
+            child_scores = -scores[targets]
+            child_scores -= np.sign(child_scores)
+            new_scores[owners] = np.maximum(
+                new_scores[owners], np.maximum.reduceat(child_scores, starts)
+            )
+
+        if np.array_equal(new_scores, scores):
+            break
+        scores = new_scores
+
+    return {
+        table: scores[offsets[table] : offsets[table] + slice_size(table)]
+        for table in tables
+    }
+
+
+def to_bytes(scores) -> bytes:
+    """Turns the solving scores of a slice (a numpy array) into the
+    bytes of its file"""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    distances = MATE - np.abs(scores.astype(np.int32))
+    values = np.where(scores > 0, distances, distances + 2)
+    values[scores == 0] = 0
+
+    if values.max(initial=0) > 255:
+        raise ValueError("A distance is too long to be stored in a byte")
+
+    return values.astype(np.uint8).tobytes()
+
+
+def generate(max_pieces: int = MAX_PIECES, directory: str = TABLEBASE_DIRECTORY):
+    """Generates every slice with up to max_pieces pieces which is
+    not in the directory yet, from the fewest pieces up
+
+    Args:
+        max_pieces (int, optional): the most pieces. Defaults to MAX_PIECES.
+        directory (str, optional): where the files go.
+            Defaults to TABLEBASE_DIRECTORY.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    for pieces in range(2, max_pieces + 1):
+        remaining = all_slices(pieces)
+
+        while remaining:
+            # a slice & its mirror (the sides swapped) lead into each other
+            table = remaining.pop(0)
+            mirror = table[2:] + table[:2]
+            tables = [table]
+
+            if mirror in remaining:
+                remaining.remove(mirror)
+                tables.append(mirror)
+
+            if all(
+                os.path.exists(os.path.join(directory, file_name(table)))
+                for table in tables
+            ):
+                continue
+
+            start_time = time.monotonic()
+            tablebase = Tablebase(directory)
+            solved = solve(tables, tablebase)
+            tablebase.close()
+
+            for table, scores in solved.items():
+                longest = MATE - int(abs(scores[scores != 0]).min(initial=MATE))
+                path = os.path.join(directory, file_name(table))
+                with open(path + ".tmp", "wb") as file:
+                    file.write(to_bytes(scores))
+                os.replace(path + ".tmp", path)
+
+                print(
+                    f"{file_name(table):>8} {len(scores):>10} positions "
+                    f"{int((scores > 0).sum()):>9} wins "
+                    f"{int((scores < 0).sum()):>9} losses "
+                    f"longest {longest:>3} "
+                    f"plies {time.monotonic() - start_time:7.1f}s"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endgame tablebase generator")
+    parser.add_argument(
+        "--pieces", type=int, default=MAX_PIECES, help="the most pieces on the board"
+    )
+    parser.add_argument(
+        "--directory", default=TABLEBASE_DIRECTORY, help="where to write the tables"
+    )
+    args = parser.parse_args()
+
+    generate(args.pieces, args.directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Contains the time manager: it turns the time left on the clock
+of the ai & the increment it gets after every move into the time
+for one move.
+
+Every move gets two limits. The soft limit is what the move should
+take: no new iteration is started after it (see iterative_deepening)
+and it grows every time the best move changes between iterations.
+The hard limit is when the search is cut off no matter what.
+"""
+
+from .board import Board
+
+# the moves still to play are guessed from the pieces on the board,
+# there are more of them at the start than in an endgame
+MIN_MOVES_TO_GO = 10
+MOVES_PER_PIECE = 1
+
+# the part of the increment that is used on the move it is given for
+INCREMENT_USAGE = 0.8
+
+# positions with only a few moves need less time, with this many
+# moves or more a position gets the full time
+FULL_TIME_MOVES = 6
+
+HARD_LIMIT_RATIO = 3
+MAX_TIME_USAGE = 0.4
+
+# the time kept on the clock for everything around the search
+SAFETY_MARGIN = 0.05
+
+# the soft limit grows this much every time the best move changes
+BEST_MOVE_CHANGE_RATIO = 1.4
+
+
+class TimeManager:
+    """Splits the clock of one side into the time for every move"""
+
+    def __init__(self, remaining: float, increment: float = 0):
+        self.remaining = remaining
+        self.increment = increment
+
+    def moves_to_go(self, board: Board) -> int:
+        """Guesses the moves the side still has to make from the game phase
+
+        Args:
+            board (Board): the board
+
+        Returns:
+            int: the number of moves
+        """
+        pieces = (board.blue | board.red).bit_count()
+        return MIN_MOVES_TO_GO + pieces * MOVES_PER_PIECE
+
+    def limits(self, board: Board, move_count: int) -> tuple[float, float]:
+        """The soft & hard limit of the next move
+
+        Args:
+            board (Board): the board
+            move_count (int): the number of legal moves
+
+        Returns:
+            tuple[float, float]: the soft & the hard limit in seconds
+        """
+        if move_count <= 1:
+            # a forced move does not need a search
+            return 0.0, 0.0
+
+        available = max(0.0, self.remaining - SAFETY_MARGIN)
+        soft = available / self.moves_to_go(board) + self.increment * INCREMENT_USAGE
+        soft *= min(1, (move_count + FULL_TIME_MOVES) / (2 * FULL_TIME_MOVES))
+
+        hard = min(soft * HARD_LIMIT_RATIO, available * MAX_TIME_USAGE)
+        return min(soft, hard), hard
+
+    def update(self, time_taken: float):
+        """Takes the time of a move off the clock & adds the increment
+
+        Args:
+            time_taken (float): the time the move took
+        """
+        self.remaining = max(0.0, self.remaining - time_taken) + self.increment
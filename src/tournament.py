@@ -0,0 +1,399 @@
+"""Contains the self-play tournament: two configurations of the ai
+play each other without pygame, one game per task of a process pool.
+
+An engine is a set of ai module settings (like
+USE_LATE_MOVE_REDUCTIONS=False or ASPIRATION_WINDOW=16) with a time
+& depth limit for every move. Every engine has its own SearchEngine
+so the transposition table & history it fills during a game do not
+leak to the other one.
+
+The games start from random openings & every opening is played
+twice with the colours swapped. The result of every game is written
+to a JSON lines file as soon as it finishes & the tournament stops
+early when the sequential probability ratio test (SPRT) decides
+between the two Elo hypotheses.
+
+    python -m src.tournament --test USE_LATE_MOVE_REDUCTIONS=False
+"""
+
+import os
+import ast
+import json
+import math
+import time
+import random
+import argparse
+import multiprocessing
+
+from . import ai
+from .board import Board
+from .move import legal_moves, play_move
+from .utils import PieceTypes
+
+TOURNAMENT_WORKERS = os.cpu_count() or 1
+TOURNAMENT_GAMES = 1000
+TOURNAMENT_TIME = 0.1
+TOURNAMENT_TABLE_SIZE_MB = 8
+
+# the ai settings only read when a SearchEngine is made, changing
+# them around a search does nothing so a tournament refuses them
+# (the table size is given to the SearchEngine of the engine instead)
+ENGINE_SETTINGS = ("MAX_PLY", "HISTORY_SIZE")
+
+OPENING_PLIES = 4
+
+# a game that is still going after this many moves is a draw
+MAX_GAME_PLIES = 300
+
+# the Elo hypotheses & error rates of the SPRT
+SPRT_ELO0 = 0
+SPRT_ELO1 = 10
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+
+WIN = 1.0
+DRAW = 0.5
+LOSS = 0.0
+
+
+def random_opening(seed: int, plies: int = OPENING_PLIES) -> list[int]:
+    """Random moves from the start position that do not end the game
+
+    Args:
+        seed (int): the seed of the opening
+        plies (int, optional): the number of moves. Defaults to OPENING_PLIES.
+
+    Returns:
+        list[int]: the move codes
+    """
+    generator = random.Random(seed)
+
+    while True:
+        board = Board(None)
+        opening = []
+
+        for _ in range(plies):
+            all_moves = legal_moves(board)
+            if not all_moves:
+                break
+
+            move = generator.choice(all_moves)
+            play_move(board, move)
+            opening.append(move)
+
+        board.update_state()
+        if board.is_playing:
+            return opening
+
+
+class Engine:
+    """One side of the tournament, the settings are applied to the ai
+    module before each of its moves & put back after them, apart from
+    TRANSPOSITION_TABLE_SIZE_MB which is the size of its table"""
+
+    def __init__(self, config: dict):
+        self.name = config["name"]
+        self.options = dict(config.get("options", {}))
+        self.time_limit = config.get("time", TOURNAMENT_TIME)
+        self.depth = config.get("depth") or ai.MAX_PLY - 1
+
+        size_mb = self.options.pop(
+            "TRANSPOSITION_TABLE_SIZE_MB", TOURNAMENT_TABLE_SIZE_MB
+        )
+
+        for option in self.options:
+            if not hasattr(ai, option):
+                raise ValueError(f"the ai has no setting {option}")
+            if option in ENGINE_SETTINGS:
+                raise ValueError(f"{option} cannot be changed in a tournament")
+
+        self.engine = ai.SearchEngine(size_mb)
+
+    def best_move(self, board: Board) -> int:
+        """Searches the move of the engine
+
+        Args:
+            board (Board): the board
+
+        Returns:
+            int: the move code
+        """
+        all_moves = list(legal_moves(board))
+        if len(all_moves) == 1:
+            return all_moves[0]
+
+        defaults = {option: getattr(ai, option) for option in self.options}
+
+        try:
+            for option, value in self.options.items():
+                setattr(ai, option, value)
+
+            move, _, _ = self.engine.iterative_deepening(
+                board, self.time_limit, all_moves, self.depth
+            )
+        finally:
+            for option, value in defaults.items():
+                setattr(ai, option, value)
+
+        return move
+
+
+def play_game(task: tuple[int, dict, dict, bool]) -> dict:
+    """Plays one game of the tournament
+
+    Args:
+        task (tuple): the opening seed, the two engine configs &
+            whether the first engine plays blue
+
+    Returns:
+        dict: the game & its result for the first engine
+    """
+    seed, first_config, second_config, first_is_blue = task
+    first, second = Engine(first_config), Engine(second_config)
+    blue, red = (first, second) if first_is_blue else (second, first)
+
+    board = Board(None)
+    opening = random_opening(seed)
+    for move in opening:
+        play_move(board, move)
+
+    start_time = time.monotonic()
+    plies = len(opening)
+
+    board.update_state()
+    while board.is_playing and plies < MAX_GAME_PLIES:
+        engine = blue if board.current_side == PieceTypes.BLUE else red
+        play_move(board, engine.best_move(board))
+        board.update_state()
+        plies += 1
+
+    result = DRAW
+    if board.winner is not None:
+        blue_won = board.winner in PieceTypes.BLUE.value
+        result = WIN if blue_won == first_is_blue else LOSS
+
+    return {
+        "seed": seed,
+        "blue": blue.name,
+        "red": red.name,
+        "result": result,
+        "plies": plies,
+        "time": round(time.monotonic() - start_time, 2),
+    }
+
+
+def game_tasks(games: int, first: dict, second: dict, seed: int = 0):
+    """The games of the tournament, every opening twice with the colours swapped"""
+    for index in range(games):
+        yield seed + index // 2, first, second, index % 2 == 0
+
+
+def elo(score: float) -> float:
+    """The Elo difference of a score between 0 & 1"""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_estimate(wins: int, draws: int, losses: int) -> tuple[float, float]:
+    """The Elo difference of the results & its 95% error margin
+
+    Args:
+        wins (int): the wins of the first engine
+        draws (int): the draws
+        losses (int): the losses of the first engine
+
+    Returns:
+        tuple[float, float]: the Elo difference & the error margin,
+            infinite while every game had the same result
+    """
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, math.inf
+
+    score = (wins + draws * DRAW) / games
+    variance = (wins * (WIN - score) ** 2 + draws * (DRAW - score) ** 2) / games
+    variance += losses * (LOSS - score) ** 2 / games
+
+    if variance == 0:
+        # all the games had the same result, the margin is not known
+        return elo(score), math.inf
+
+    error = 1.96 * math.sqrt(variance / games)
+    return elo(score), (elo(score + error) - elo(score - error)) / 2
+
+
+def sprt(
+    wins: int,
+    draws: int,
+    losses: int,
+    elo0: float = SPRT_ELO0,
+    elo1: float = SPRT_ELO1,
+) -> float:
+    """The log likelihood ratio of elo1 against elo0, using the normal
+    approximation of the game results
+
+    Args:
+        wins (int): the wins of the first engine
+        draws (int): the draws
+        losses (int): the losses of the first engine
+        elo0 (float, optional): the Elo if the change does not help.
+            Defaults to SPRT_ELO0.
+        elo1 (float, optional): the Elo if the change helps.
+            Defaults to SPRT_ELO1.
+
+    Returns:
+        float: the log likelihood ratio
+    """
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0
+
+    score = (wins + draws * DRAW) / games
+    variance = (wins * (WIN - score) ** 2 + draws * (DRAW - score) ** 2) / games
+    variance += losses * (LOSS - score) ** 2 / games
+
+    if variance == 0:
+        # all the games had the same result, there is nothing to go on yet
+        return 0.0
+
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(
+    alpha: float = SPRT_ALPHA, beta: float = SPRT_BETA
+) -> tuple[float, float]:
+    """The log likelihood ratios where elo0 & elo1 are accepted"""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def run_tournament(
+    first: dict,
+    second: dict,
+    games: int = TOURNAMENT_GAMES,
+    workers: int = TOURNAMENT_WORKERS,
+    output: str = "tournament.jsonl",
+    seed: int = 0,
+    elo0: float = SPRT_ELO0,
+    elo1: float = SPRT_ELO1,
+) -> dict:
+    """Plays the tournament & stops when the SPRT decides
+
+    Args:
+        first (dict): the config of the engine that is tested
+        second (dict): the config of the engine it is tested against
+        games (int, optional): the most games. Defaults to TOURNAMENT_GAMES.
+        workers (int, optional): the processes. Defaults to TOURNAMENT_WORKERS.
+        output (str, optional): the results file. Defaults to "tournament.jsonl".
+        seed (int, optional): the seed of the first opening. Defaults to 0.
+        elo0 (float, optional): the Elo of the null hypothesis. Defaults to SPRT_ELO0.
+        elo1 (float, optional): the Elo of the other one. Defaults to SPRT_ELO1.
+
+    Returns:
+        dict: the wins, draws & losses of the first engine, the Elo & the SPRT result
+    """
+    results = {WIN: 0, DRAW: 0, LOSS: 0}
+    lower, upper = sprt_bounds()
+    decision = None
+
+    with multiprocessing.Pool(workers) as pool, open(
+        output, "a", encoding="utf-8"
+    ) as file:
+        for game in pool.imap_unordered(
+            play_game, game_tasks(games, first, second, seed)
+        ):
+            file.write(json.dumps(game) + "\n")
+            file.flush()
+
+            results[game["result"]] += 1
+            wins, draws, losses = results[WIN], results[DRAW], results[LOSS]
+
+            difference, error = elo_estimate(wins, draws, losses)
+            llr = sprt(wins, draws, losses, elo0, elo1)
+            print(
+                f"games {wins + draws + losses:>5}  +{wins} ={draws} -{losses}  "
+                f"elo {difference:+.1f} +- {error:.1f}  "
+                f"llr {llr:.2f} ({lower:.2f}, {upper:.2f})"
+            )
+
+            if llr <= lower or llr >= upper:
+                decision = "H1" if llr >= upper else "H0"
+                pool.terminate()
+                break
+
+    wins, draws, losses = results[WIN], results[DRAW], results[LOSS]
+    difference, error = elo_estimate(wins, draws, losses)
+
+    return {
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "elo": difference,
+        "error": error,
+        "sprt": decision,
+    }
+
+
+def parse_options(options: list[str]) -> dict:
+    """Turns SETTING=VALUE arguments into a dict of ai settings"""
+    parsed = {}
+
+    for option in options:
+        name, _, value = option.partition("=")
+        parsed[name] = ast.literal_eval(value)
+
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play tournament")
+    parser.add_argument(
+        "--test", nargs="*", default=[], help="SETTING=VALUE of the tested engine"
+    )
+    parser.add_argument(
+        "--base", nargs="*", default=[], help="SETTING=VALUE of the base engine"
+    )
+    parser.add_argument("--games", type=int, default=TOURNAMENT_GAMES)
+    parser.add_argument("--time", type=float, default=TOURNAMENT_TIME)
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=TOURNAMENT_WORKERS)
+    parser.add_argument("--output", default="tournament.jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--elo0", type=float, default=SPRT_ELO0)
+    parser.add_argument("--elo1", type=float, default=SPRT_ELO1)
+    args = parser.parse_args()
+
+    first = {
+        "name": "test",
+        "options": parse_options(args.test),
+        "time": args.time,
+        "depth": args.depth,
+    }
+    second = {
+        "name": "base",
+        "options": parse_options(args.base),
+        "time": args.time,
+        "depth": args.depth,
+    }
+
+    summary = run_tournament(
+        first,
+        second,
+        args.games,
+        args.workers,
+        args.output,
+        args.seed,
+        args.elo0,
+        args.elo1,
+    )
+    print(
+        f"+{summary['wins']} ={summary['draws']} -{summary['losses']}  "
+        f"elo {summary['elo']:+.1f} +- {summary['error']:.1f}  "
+        f"sprt {summary['sprt'] or 'undecided'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
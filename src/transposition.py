@@ -0,0 +1,261 @@
+"""Contains the fixed size transposition table
+used by the ai to remember the positions it already searched
+"""
+
+import struct
+
+# the kind of score stored in an entry
+EXACT = 0
+LOWER_BOUND = 1  # the search failed high, the score is at least this
+UPPER_BOUND = 2  # the search failed low, the score is at most this
+
+# rough cost of a single entry in bytes (the tuple, its values
+# & the pointer to it) used to turn a size in MB into a number of entries
+ENTRY_SIZE = 128
+
+# the layout of the data word of an entry in the shared table
+SHARED_ENTRY_SIZE = 24
+MOVE_MASK = (1 << 45) - 1
+DEPTH_SHIFT = 45
+FLAG_SHIFT = 53
+VALID_FLAG = 1 << 55
+
+_WORD = struct.Struct("<Q")
+_FLOAT = struct.Struct("<d")
+
+
+class TranspositionTable:
+    """A fixed size hash table of searched positions.
+
+    Every bucket has two slots, the first one only gets replaced
+    by a search of equal or greater depth (depth preferred) and
+    the second one is always replaced so recent positions are
+    never lost. Each entry is a tuple of
+    (key, depth, score, flag, best_move)
+    """
+
+    def __init__(self, size_mb: float = 16):
+        self.size_mb = size_mb
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+        # the number of buckets is rounded down to a power of two
+        # so the bucket of a key can be found with a mask
+        buckets = max(1, int(size_mb * 1024 * 1024) // (ENTRY_SIZE * 2))
+        self.__mask = (1 << (buckets.bit_length() - 1)) - 1
+
+        self.__depth_preferred: list[tuple | None] = [None] * (self.__mask + 1)
+        self.__always_replace: list[tuple | None] = [None] * (self.__mask + 1)
+
+    def __len__(self) -> int:
+        return (self.__mask + 1) * 2
+
+    def probe(self, key: int) -> tuple | None:
+        """Looks up a position in the table
+
+        Args:
+            key (int): the Zobrist key of the position
+
+        Returns:
+            tuple | None: (key, depth, score, flag, best_move) or None
+        """
+        index = key & self.__mask
+
+        entry = self.__depth_preferred[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+
+        other = self.__always_replace[index]
+        if other is not None and other[0] == key:
+            self.hits += 1
+            return other
+
+        self.misses += 1
+        if entry is not None or other is not None:
+            self.collisions += 1
+
+        return None
+
+    def store(self, key: int, depth: int, score: float, flag: int, best_move=None):
+        """Stores the result of a search
+
+        Args:
+            key (int): the Zobrist key of the position
+            depth (int): the depth the position was searched to
+            score (float): the score found
+            flag (int): EXACT, LOWER_BOUND or UPPER_BOUND
+            best_move (optional): the best move found. Defaults to None.
+        """
+        index = key & self.__mask
+        entry = self.__depth_preferred[index]
+        self.stores += 1
+
+        if entry is not None and entry[0] == key and best_move is None:
+            # keep the move of an older search of the position
+            best_move = entry[4]
+
+        if entry is None or depth >= entry[1]:
+            self.__depth_preferred[index] = (key, depth, score, flag, best_move)
+            return
+
+        self.__always_replace[index] = (key, depth, score, flag, best_move)
+
+    def clear(self):
+        """Removes all the entries & resets the counters"""
+        self.__depth_preferred = [None] * (self.__mask + 1)
+        self.__always_replace = [None] * (self.__mask + 1)
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Resets the hit, miss, collision & store counters"""
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The ratio of probes that found their position"""
+        probes = self.hits + self.misses
+        return self.hits / probes if probes > 0 else 0.0
+
+
+class SharedTranspositionTable:
+    """A transposition table in shared memory that many processes
+    can read & write at the same time without any locks.
+
+    It uses the same buckets as TranspositionTable but every entry
+    is three 64 bit words: the key xor the other two words, the
+    score (as the bits of a float) & the data (best move, depth &
+    flag). An entry torn by two processes writing at once fails
+    the xor check when it is read so it is just seen as a miss
+    """
+
+    def __init__(self, size_mb: float = 16, name: str | None = None):
+        self.size_mb = size_mb
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+        buckets = max(1, int(size_mb * 1024 * 1024) // (SHARED_ENTRY_SIZE * 2))
+        self.__mask = (1 << (buckets.bit_length() - 1)) - 1
+        size = (self.__mask + 1) * SHARED_ENTRY_SIZE * 2
+
+        # only imported here so the game still loads where there is no
+        # shared memory, like the browser build of pygbag
+        from multiprocessing import (  # pylint: disable=import-outside-toplevel
+            shared_memory,
+        )
+
+        # the table that creates the memory is the one that frees it,
+        # the worker processes only open it by its name
+        self.is_owner = name is None
+        self.shared_memory = shared_memory.SharedMemory(
+            name=name, create=self.is_owner, size=size
+        )
+
+        self.name = self.shared_memory.name
+        self.__words = self.shared_memory.buf.cast("Q")
+
+    def __len__(self) -> int:
+        return (self.__mask + 1) * 2
+
+    def probe(self, key: int) -> tuple | None:
+        """Looks up a position in the table
+
+        Args:
+            key (int): the Zobrist key of the position
+
+        Returns:
+            tuple | None: (key, depth, score, flag, best_move) or None
+        """
+        words = self.__words
+        index = (key & self.__mask) * 6
+        is_empty = True
+
+        for slot in (index, index + 3):
+            check, score, data = words[slot], words[slot + 1], words[slot + 2]
+
+            if not data:
+                continue
+
+            is_empty = False
+            if check ^ score ^ data == key:
+                self.hits += 1
+                return (
+                    key,
+                    data >> DEPTH_SHIFT & 0xFF,
+                    _FLOAT.unpack(_WORD.pack(score))[0],
+                    data >> FLAG_SHIFT & 0b11,
+                    data & MOVE_MASK or None,
+                )
+
+        self.misses += 1
+        if not is_empty:
+            self.collisions += 1
+
+        return None
+
+    def store(self, key: int, depth: int, score: float, flag: int, best_move=None):
+        """Stores the result of a search
+
+        Args:
+            key (int): the Zobrist key of the position
+            depth (int): the depth the position was searched to
+            score (float): the score found
+            flag (int): EXACT, LOWER_BOUND or UPPER_BOUND
+            best_move (int, optional): the best move code. Defaults to None.
+        """
+        words = self.__words
+        slot = (key & self.__mask) * 6
+        self.stores += 1
+
+        data = words[slot + 2]
+        is_same = data and words[slot] ^ words[slot + 1] ^ data == key
+
+        if is_same and best_move is None:
+            # keep the move of an older search of the position
+            best_move = data & MOVE_MASK
+
+        if data and depth < data >> DEPTH_SHIFT & 0xFF:
+            # the depth preferred slot has a deeper search
+            slot += 3
+
+        score_bits = _WORD.unpack(_FLOAT.pack(score))[0]
+        data = (best_move or 0) | depth << DEPTH_SHIFT | flag << FLAG_SHIFT
+        data |= VALID_FLAG
+
+        words[slot + 1] = score_bits
+        words[slot + 2] = data
+        words[slot] = key ^ score_bits ^ data
+
+    def clear(self):
+        """Removes all the entries & resets the counters"""
+        self.shared_memory.buf[:] = bytes(self.shared_memory.size)
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Resets the hit, miss, collision & store counters"""
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The ratio of probes that found their position"""
+        probes = self.hits + self.misses
+        return self.hits / probes if probes > 0 else 0.0
+
+    def close(self):
+        """Stops using the shared memory & frees it if
+        this is the table that created it"""
+        self.__words.release()
+        self.shared_memory.close()
+
+        if self.is_owner:
+            self.shared_memory.unlink()
@@ -0,0 +1,21 @@
+"""Contains the random keys used for Zobrist hashing
+of the board. The keys come from a fixed seed so that a
+position has the same key in every process & every run
+(which lets the keys be stored in files & shared memory)
+"""
+
+import random
+
+ZOBRIST_SEED = 0x5EED
+
+_generator = random.Random(ZOBRIST_SEED)
+
+# the key of each piece on each of the 32 dark squares
+PIECE_KEYS: dict[int, list[int]] = {
+    piece: [_generator.getrandbits(64) for _ in range(32)] for piece in (1, 2, -1, -2)
+}
+
+# mixed in when it is red to play
+SIDE_KEY = _generator.getrandbits(64)
+
+del _generator
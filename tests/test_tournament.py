@@ -0,0 +1,36 @@
+import math
+
+import pytest
+
+from src.tournament import Engine, elo_estimate, sprt, sprt_bounds
+
+
+def test_sprt_accepts_elo1_without_losses():
+    lower, upper = sprt_bounds()
+    elo, _ = elo_estimate(30, 70, 0)
+
+    assert elo > 100
+    assert sprt(30, 70, 0) > upper > lower
+
+
+def test_sprt_waits_without_games_or_variance():
+    assert sprt(0, 0, 0) == 0.0
+    assert sprt(10, 0, 0) == 0.0
+    assert sprt(0, 12, 0) == 0.0
+
+
+def test_elo_margin_is_unknown_without_variance():
+    assert elo_estimate(0, 0, 0)[1] == math.inf
+    assert elo_estimate(0, 0, 8)[1] == math.inf
+    assert elo_estimate(5, 0, 0)[1] == math.inf
+    assert elo_estimate(30, 70, 0)[1] < math.inf
+
+
+def test_engine_sizes_its_table_and_refuses_engine_settings():
+    engine = Engine({"name": "test", "options": {"TRANSPOSITION_TABLE_SIZE_MB": 1}})
+
+    assert engine.options == {}
+    assert engine.engine.transposition_table.size_mb == 1
+
+    with pytest.raises(ValueError):
+        Engine({"name": "test", "options": {"MAX_PLY": 16}})